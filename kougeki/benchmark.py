@@ -0,0 +1,122 @@
+"""Throughput of the legacy sequential loop versus the async engine.
+
+The legacy script analyzed one row at a time, waiting for moderation and
+then for the chat model before starting the next row. :func:`compare`
+runs that loop and :func:`kougeki.engine.analyze_texts` against the same
+client, either a :class:`SimulatedClient` with a fixed latency or a
+:class:`~kougeki.transport.ReplayClient` serving recorded traffic, and
+reports rows per second for both.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass, fields
+from types import SimpleNamespace
+
+from . import engine, services
+from .models import ModerationScores
+
+logger = logging.getLogger(__name__)
+
+
+class SimulatedClient:
+    """Stand-in for ``AsyncOpenAI`` answering every request after ``latency``."""
+
+    def __init__(self, latency: float = 0.5):
+        self.latency = latency
+        self.moderations = SimpleNamespace(create=self._moderate)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat))
+
+    async def _moderate(self, *, input, model):
+        await asyncio.sleep(self.latency)
+        texts = input if isinstance(input, list) else [input]
+        names = [field.name for field in fields(ModerationScores)]
+        result = SimpleNamespace(
+            categories=SimpleNamespace(**{name: False for name in names}),
+            category_scores=SimpleNamespace(**{name: 0.0 for name in names}),
+        )
+        return SimpleNamespace(results=[result for _ in texts])
+
+    async def _chat(self, **kwargs):
+        await asyncio.sleep(self.latency)
+        content = json.dumps({"score": 0, "reason": "simulated"})
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+@dataclass(slots=True)
+class BenchmarkResult:
+    rows: int
+    legacy_seconds: float
+    engine_seconds: float
+
+    @property
+    def legacy_rows_per_second(self) -> float:
+        return self.rows / self.legacy_seconds if self.legacy_seconds else 0.0
+
+    @property
+    def engine_rows_per_second(self) -> float:
+        return self.rows / self.engine_seconds if self.engine_seconds else 0.0
+
+    def summary(self) -> str:
+        speedup = (
+            self.engine_rows_per_second / self.legacy_rows_per_second
+            if self.legacy_rows_per_second
+            else 0.0
+        )
+        return "\n".join(
+            [
+                f"rows: {self.rows}",
+                f"legacy sequential: {self.legacy_rows_per_second:.2f} rows/s "
+                f"({self.legacy_seconds:.1f} s)",
+                f"async engine: {self.engine_rows_per_second:.2f} rows/s "
+                f"({self.engine_seconds:.1f} s)",
+                f"speedup: {speedup:.1f}x",
+            ]
+        )
+
+
+async def run_legacy(texts: Sequence[str]) -> float:
+    """Analyze ``texts`` one row and one request at a time; return seconds."""
+    started = time.perf_counter()
+    for text in texts:
+        await services.moderate_text(text)
+        await services.get_aggressiveness_score(text)
+    return time.perf_counter() - started
+
+
+async def run_engine(texts: Sequence[str], concurrency: int | None = None) -> float:
+    """Analyze ``texts`` with :func:`kougeki.engine.analyze_texts`; return seconds."""
+    started = time.perf_counter()
+    await engine.analyze_texts(texts, concurrency)
+    return time.perf_counter() - started
+
+
+async def compare(
+    texts: Sequence[str], client, concurrency: int | None = None
+) -> BenchmarkResult:
+    """Time both code paths against ``client`` without rate limiting.
+
+    ``services.client`` and ``services.rate_limiter`` are restored
+    afterwards.
+    """
+    previous_client = services.__dict__.get("client")
+    previous_limiter = services.rate_limiter
+    services.client = client
+    services.rate_limiter = None
+    try:
+        legacy = await run_legacy(texts)
+        fresh = await run_engine(texts, concurrency)
+    finally:
+        if previous_client is None:
+            # Let services.get_client() build the real client lazily again.
+            del services.client
+        else:
+            services.client = previous_client
+        services.rate_limiter = previous_limiter
+    result = BenchmarkResult(len(texts), legacy, fresh)
+    logger.info("benchmark: %s", result.summary().replace("\n", "; "))
+    return result
@@ -0,0 +1,120 @@
+"""Circuit breaker for failing API endpoints."""
+
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an endpoint whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Stop calling an endpoint once too many recent calls have failed.
+
+    The breaker is *closed* while the failure rate over the last ``window``
+    calls stays below ``failure_rate``. It then *opens* and every call fails
+    fast with :class:`CircuitOpenError` for ``open_seconds``. Afterwards it
+    is *half-open*: up to ``half_open_probes`` calls are let through, and the
+    first result decides whether it closes again or reopens. A probe that is
+    cancelled gives its slot back, and probes still unresolved after
+    ``probe_seconds`` are written off so that new ones can be sent.
+
+    Parameters
+    ----------
+    name:
+        Endpoint name used in log messages.
+    failure_rate:
+        Fraction of failed calls that opens the circuit.
+    min_calls:
+        Calls observed before the failure rate is evaluated.
+    window:
+        Number of recent calls considered.
+    open_seconds:
+        Time the circuit stays open before probing.
+    half_open_probes:
+        Concurrent probe calls allowed while half-open.
+    probe_seconds:
+        Time after which unresolved probes no longer hold their slots;
+        defaults to ``open_seconds``.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        min_calls: int = 10,
+        window: int = 20,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 1,
+        probe_seconds: float | None = None,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.probe_seconds = open_seconds if probe_seconds is None else probe_seconds
+        self.outcomes: deque[bool] = deque(maxlen=window)
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.probes = 0
+        self.probed_at = 0.0
+
+    def before_call(self) -> None:
+        """Raise :class:`CircuitOpenError` if the call must not be made."""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            self.state = self.HALF_OPEN
+            self.probes = 0
+            logger.info("%s circuit half-open; probing", self.name)
+        if self.state == self.HALF_OPEN:
+            now = time.monotonic()
+            if self.probes and now - self.probed_at >= self.probe_seconds:
+                logger.warning(
+                    "%s circuit probe unanswered for %.0f s; probing again",
+                    self.name,
+                    self.probe_seconds,
+                )
+                self.probes = 0
+            if self.probes >= self.half_open_probes:
+                raise CircuitOpenError(f"{self.name} circuit is half-open")
+            self.probes += 1
+            self.probed_at = now
+
+    def release_probe(self) -> None:
+        """Give back the slot of a call that ended without a result."""
+        if self.state == self.HALF_OPEN and self.probes:
+            self.probes -= 1
+
+    def record_success(self) -> None:
+        if self.state == self.HALF_OPEN:
+            logger.info("%s circuit closed", self.name)
+            self.state = self.CLOSED
+            self.outcomes.clear()
+        self.outcomes.append(True)
+
+    def record_failure(self) -> None:
+        if self.state == self.HALF_OPEN:
+            self._open()
+            return
+        self.outcomes.append(False)
+        if self.state == self.CLOSED and len(self.outcomes) >= self.min_calls:
+            failures = self.outcomes.count(False)
+            if failures / len(self.outcomes) >= self.failure_rate:
+                self._open()
+
+    def _open(self) -> None:
+        logger.warning(
+            "%s circuit opened for %.0f s", self.name, self.open_seconds
+        )
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.outcomes.clear()
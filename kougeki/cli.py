@@ -0,0 +1,355 @@
+"""Command line interface for running analyses without the GUI."""
+
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+
+from . import (
+    benchmark,
+    engine,
+    preflight,
+    sampling,
+    server,
+    services,
+    store,
+    workbook,
+)
+from .config import settings
+from .logging_config import setup_logging
+from .ratelimit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+def _log_progress(completed: int, total: int) -> None:
+    logger.info("analyzed %s/%s rows", completed, total)
+
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer: {value}")
+    return number
+
+
+def _read_selected(args: argparse.Namespace):
+    """Read all sheets of ``args.input`` and the texts of the selected ones.
+
+    Returns ``(frames, sheets, texts)`` or ``None`` after logging why the
+    input cannot be analyzed.
+    """
+    frames = workbook.read_workbook(args.input)
+    try:
+        sheets = workbook.select_sheets(list(frames), args.sheets)
+    except ValueError as exc:
+        logger.error("%s: %s", exc, args.input)
+        return None
+    texts, spans = workbook.collect_texts(frames, sheets)
+    if not spans:
+        logger.error("「投稿内容」列が見つかりません: %s", args.input)
+        return None
+    return frames, sheets, texts
+
+
+def run_analyze(args: argparse.Namespace) -> int:
+    selected = _read_selected(args)
+    if selected is None:
+        return 1
+    frames, sheets, texts = selected
+    if args.dry_run:
+        report = preflight.estimate(
+            texts,
+            concurrency=args.concurrency,
+            shards=args.shards,
+            requests_per_second=args.rps,
+        )
+        print(report.summary())
+        return 0
+    if args.rps is not None:
+        services.rate_limiter = RateLimiter(args.rps) if args.rps > 0 else None
+    result_store = store.ResultStore(args.db) if args.db else store.open_store()
+    try:
+        asyncio.run(
+            workbook.analyze_workbook(
+                frames,
+                sheets,
+                shards=args.shards,
+                concurrency=args.concurrency,
+                requests_per_second=args.rps,
+                on_progress=_log_progress,
+                store=result_store,
+            )
+        )
+    finally:
+        if result_store is not None:
+            result_store.close()
+    workbook.write_workbook(args.output, frames)
+    logger.info("saved results to %s", args.output)
+    return 0
+
+
+def run_backfill(args: argparse.Namespace) -> int:
+    frames = workbook.read_workbook(args.input)
+    result_store = store.ResultStore(args.db) if args.db else store.open_store()
+    try:
+        count = asyncio.run(
+            workbook.backfill_workbook(
+                frames, on_progress=_log_progress, store=result_store
+            )
+        )
+    finally:
+        if result_store is not None:
+            result_store.close()
+    workbook.write_workbook(args.output, frames)
+    logger.info(
+        "backfilled %s rows, %s still pending; saved to %s",
+        count,
+        sum(len(engine.pending_rows(df)) for df in frames.values()),
+        args.output,
+    )
+    return 0
+
+
+def run_sample(args: argparse.Namespace) -> int:
+    selected = _read_selected(args)
+    if selected is None:
+        return 1
+    texts = selected[2]
+    result_store = store.ResultStore(args.db) if args.db else store.open_store()
+    try:
+        report = asyncio.run(
+            sampling.sample_estimate(
+                texts,
+                size=args.size,
+                strategy=args.strata,
+                threshold=args.threshold,
+                confidence=args.confidence,
+                target_margin=args.target_margin,
+                step=args.step,
+                max_rows=args.max_rows,
+                seed=args.seed,
+                concurrency=args.concurrency,
+                store=result_store,
+            )
+        )
+    finally:
+        if result_store is not None:
+            result_store.close()
+    print(report.summary())
+    return 0
+
+
+def run_benchmark(args: argparse.Namespace) -> int:
+    if args.input:
+        frames = workbook.read_workbook(args.input)
+        texts, _ = workbook.collect_texts(
+            frames, workbook.select_sheets(list(frames))
+        )
+        texts = texts[: args.rows]
+    else:
+        texts = [f"ベンチマーク用の投稿 {i}" for i in range(args.rows)]
+    if args.cassette:
+        from .transport import ReplayClient
+
+        client = ReplayClient(args.cassette, speed=settings.replay_speed)
+    else:
+        client = benchmark.SimulatedClient(args.latency)
+    result = asyncio.run(benchmark.compare(texts, client, args.concurrency))
+    print(result.summary())
+    return 0
+
+
+def run_serve(args: argparse.Namespace) -> int:
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        logger.info("scoring service stopped")
+    return 0
+
+
+def _open_history(args: argparse.Namespace) -> store.ResultStore | None:
+    path = args.db or settings.results_db
+    if not path:
+        logger.error("no results store configured; pass --db or set RESULTS_DB")
+        return None
+    return store.ResultStore(path)
+
+
+def run_history(args: argparse.Namespace) -> int:
+    result_store = _open_history(args)
+    if result_store is None:
+        return 1
+    try:
+        rows = result_store.history(text=args.text, digest=args.hash, limit=args.limit)
+    finally:
+        result_store.close()
+    for row in rows:
+        created = datetime.fromtimestamp(row["created_at"]).isoformat(timespec="seconds")
+        print(
+            f"{created}\t{row['text_hash'][:12]}\t{row['model']}\t"
+            f"{row['aggressiveness_score']}\t{row['aggressiveness_overall']}\t"
+            f"{row['aggressiveness_reason']}\t{row['text'][:40]}"
+        )
+    return 0
+
+
+def run_export(args: argparse.Namespace) -> int:
+    result_store = _open_history(args)
+    if result_store is None:
+        return 1
+    since = datetime.fromisoformat(args.since).timestamp() if args.since else None
+    try:
+        count = result_store.export_csv(args.output, since=since)
+    finally:
+        result_store.close()
+    logger.info("exported %s rows to %s", count, args.output)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="kougeki")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    analyze = subparsers.add_parser("analyze", help="analyze an Excel file")
+    analyze.add_argument("input", help="input .xlsx with a 投稿内容 column")
+    analyze.add_argument("-o", "--output", help="output .xlsx path")
+    analyze.add_argument(
+        "--shards", type=int, default=None, help="number of worker processes"
+    )
+    analyze.add_argument(
+        "--concurrency", type=int, default=None, help="rows in flight per process"
+    )
+    analyze.add_argument(
+        "--rps",
+        type=float,
+        default=None,
+        help="requests per second shared by all processes (0 = unlimited)",
+    )
+    analyze.add_argument(
+        "--db", default=None, help="results store used as history and warm cache"
+    )
+    analyze.add_argument(
+        "--sheets",
+        default=None,
+        help='sheets to analyze: "*" for all or comma-separated names '
+        "(default: EXCEL_SHEETS, else the first sheet)",
+    )
+    analyze.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="only print estimated tokens, cost and time",
+    )
+    analyze.set_defaults(func=run_analyze)
+
+    sample = subparsers.add_parser(
+        "sample", help="estimate the score distribution from a stratified sample"
+    )
+    sample.add_argument("input", help="input .xlsx with a 投稿内容 column")
+    sample.add_argument("--sheets", default=None, help="sheets to sample from")
+    sample.add_argument(
+        "--size",
+        type=_positive_int,
+        default=400,
+        help="rows scored in the first round",
+    )
+    sample.add_argument(
+        "--strata",
+        choices=sampling.STRATEGIES,
+        default="length",
+        help="stratify by text length or by a batched moderation pass",
+    )
+    sample.add_argument(
+        "--threshold", type=int, default=6, help="score counted as aggressive"
+    )
+    sample.add_argument(
+        "--confidence", type=float, default=0.95, help="confidence level"
+    )
+    sample.add_argument(
+        "--target-margin",
+        type=float,
+        default=None,
+        help="keep sampling until the aggressive share is within this margin",
+    )
+    sample.add_argument(
+        "--step",
+        type=_positive_int,
+        default=None,
+        help="extra rows per additional round",
+    )
+    sample.add_argument(
+        "--max-rows",
+        type=_positive_int,
+        default=None,
+        help="upper bound on sampled rows",
+    )
+    sample.add_argument("--seed", type=int, default=None, help="random seed")
+    sample.add_argument(
+        "--concurrency", type=int, default=None, help="rows in flight"
+    )
+    sample.add_argument("--db", default=None, help="results store path")
+    sample.set_defaults(func=run_sample)
+
+    backfill = subparsers.add_parser(
+        "backfill", help="re-score rows marked llm_pending in a results file"
+    )
+    backfill.add_argument("input", help="results .xlsx from an earlier run")
+    backfill.add_argument("-o", "--output", required=True, help="output .xlsx path")
+    backfill.add_argument("--db", default=None, help="results store path")
+    backfill.set_defaults(func=run_backfill)
+
+    bench = subparsers.add_parser(
+        "benchmark", help="compare legacy sequential and async engine throughput"
+    )
+    bench.add_argument("--rows", type=int, default=100, help="rows to analyze")
+    bench.add_argument(
+        "--latency", type=float, default=0.5, help="simulated seconds per request"
+    )
+    bench.add_argument(
+        "--concurrency", type=int, default=None, help="rows in flight for the engine"
+    )
+    bench.add_argument(
+        "--input", default=None, help="take texts from this .xlsx instead of samples"
+    )
+    bench.add_argument(
+        "--cassette",
+        default=None,
+        help="replay recorded traffic from this cassette instead of simulating",
+    )
+    bench.set_defaults(func=run_benchmark, needs_api=False)
+
+    serve = subparsers.add_parser("serve", help="run the HTTP scoring service")
+    serve.add_argument("--host", default=None, help="bind address")
+    serve.add_argument("--port", type=int, default=None, help="listen port")
+    serve.set_defaults(func=run_serve)
+
+    history = subparsers.add_parser("history", help="show stored results")
+    history.add_argument("--db", default=None, help="results store path")
+    history.add_argument("--text", default=None, help="only rows for this text")
+    history.add_argument("--hash", default=None, help="only rows for this text hash")
+    history.add_argument("--limit", type=int, default=50, help="maximum rows")
+    history.set_defaults(func=run_history, needs_api=False)
+
+    export = subparsers.add_parser("export", help="export stored results to CSV")
+    export.add_argument("output", help="output .csv path")
+    export.add_argument("--db", default=None, help="results store path")
+    export.add_argument(
+        "--since", default=None, help="only rows stored on or after this ISO date"
+    )
+    export.set_defaults(func=run_export, needs_api=False)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    dry_run = getattr(args, "dry_run", False)
+    if args.command == "analyze" and not dry_run and not args.output:
+        parser.error("analyze requires --output unless --dry-run is given")
+    setup_logging()
+    needs_api = getattr(args, "needs_api", True) and not dry_run
+    if needs_api and not settings.is_configured:
+        raise RuntimeError(
+            "OpenAI API key is not configured. Set OPENAI_API_KEY in .env"
+        )
+    return args.func(args)
@@ -11,16 +11,53 @@ class Settings(BaseSettings):
     moderation_model: str = "omni-moderation-latest"
     log_level: str = "INFO"
     log_file: str = "kougeki.log"
+    log_json: bool = False
+    log_dedup_seconds: float = 10.0
     chat_temperature: float = 0.1
     llm_weight: float = 0.7
     hate_weight: float = 0.2
     violence_weight: float = 0.1
+    concurrency: int = 8
+    requests_per_second: float = 0.0
+    shard_count: int = 1
+    retry_failed_rows: bool = True
+    retry_failed_concurrency: int = 2
+    cascade_enabled: bool = False
+    cascade_clean_below: float = 0.05
+    cascade_severe_above: float = 0.8
+    moderation_batch_size: int = 32
+    escalation_model: str = ""
+    escalation_min_score: int = 3
+    escalation_max_score: int = 6
+    hedge_enabled: bool = False
+    hedge_budget: float = 0.05
+    hedge_quantile: float = 0.95
+    hedge_min_samples: int = 20
+    breaker_failure_rate: float = 0.5
+    breaker_min_calls: int = 10
+    breaker_window: int = 20
+    breaker_open_seconds: float = 30.0
+    cassette_mode: str = ""
+    cassette_path: str = "kougeki_cassette.jsonl.gz"
+    replay_speed: float = 1.0
+    server_host: str = "127.0.0.1"
+    server_port: int = 8080
+    server_cache_size: int = 1024
+    server_slo_ms: float = 2000.0
+    results_db: str = ""
+    excel_sheets: str = ""
+    max_input_tokens: int = 2000
+    expected_output_tokens: int = 60
+    expected_latency_seconds: float = 1.5
+    tokens_per_minute: int = 0
+    chat_input_price_per_million: float = 0.40
+    chat_output_price_per_million: float = 1.60
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
     @property
     def is_configured(self) -> bool:
-        return bool(self.openai_api_key)
+        return bool(self.openai_api_key) or self.cassette_mode.lower() == "replay"
 
 
 settings = Settings()
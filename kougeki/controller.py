@@ -2,12 +2,13 @@ import asyncio
 import logging
 import threading
 from tkinter import filedialog, messagebox
+from typing import TYPE_CHECKING
 
-import pandas as pd
-
-from . import services
-from .constants import CATEGORY_NAMES, STATUS_COLORS
+from . import preflight, store, workbook
+from .constants import STATUS_COLORS
 
+if TYPE_CHECKING:
+    import pandas as pd
 
 logger = logging.getLogger(__name__)
 
@@ -17,7 +18,13 @@ class ModerationController:
 
     def __init__(self, view):
         self.view = view
-        self.df: pd.DataFrame | None = None
+        self.df: "pd.DataFrame | None" = None
+        #: Every sheet of the loaded workbook, written back on save.
+        self.sheets: "dict[str, pd.DataFrame] | None" = None
+        #: Sheets chosen by ``EXCEL_SHEETS`` for analysis.
+        self.selected: list[str] | None = None
+        #: Output columns to write; ``None`` writes all of them.
+        self.columns: "list[str] | None" = None
 
     # ------------------------------------------------------------------
     # Helper methods for thread-safe GUI updates
@@ -39,9 +46,14 @@ class ModerationController:
         if not file_path:
             return
         try:
-            self.df = pd.read_excel(file_path, sheet_name=0)
+            sheets = workbook.read_workbook(file_path)
+            selected = workbook.select_sheets(list(sheets))
+            self.sheets, self.selected = sheets, selected
+            self.df = sheets[selected[0]]
+            rows = sum(len(sheets[name]) for name in selected)
+            note = f"（{len(selected)}シート）" if len(selected) > 1 else ""
             self._update_status(
-                f"ファイルを読み込みました: {len(self.df)}件のデータ",
+                f"ファイルを読み込みました: {rows}件のデータ{note}",
                 STATUS_COLORS["success"],
             )
             self._call_view(self.view.enable_analyze, True)
@@ -64,7 +76,7 @@ class ModerationController:
         if not save_path:
             return
         try:
-            self.df.to_excel(save_path, index=False)
+            workbook.write_workbook(save_path, self._frames())
             self._update_status(
                 "結果を保存しました", STATUS_COLORS["success"]
             )
@@ -73,55 +85,75 @@ class ModerationController:
             self._update_status("保存に失敗しました", STATUS_COLORS["error"])
             messagebox.showerror("保存エラー", f"ファイルを保存できませんでした: {exc}")
 
+    def _frames(self) -> "dict[str, pd.DataFrame]":
+        """Return the loaded sheets, or ``self.df`` alone if set directly."""
+        if self.sheets is not None:
+            return self.sheets
+        if self.df is None:
+            return {}
+        return {"Sheet1": self.df}
+
     def analyze_file_async(self):
-        """Run analysis in a worker thread to keep the GUI responsive."""
+        """Run analysis in a worker thread to keep the GUI responsive.
+
+        A token, cost and time estimate is shown first so the user can
+        cancel before any request is sent.
+        """
+        texts, spans = workbook.collect_texts(self._frames(), self.selected)
+        if spans:
+            report = preflight.estimate(texts)
+            if not messagebox.askokcancel(
+                "実行前の見積もり", f"{report.summary()}\n\n分析を開始しますか？"
+            ):
+                return
         threading.Thread(
             target=lambda: asyncio.run(self._analyze_file()), daemon=True
         ).start()
 
     async def _analyze_file(self):
-        if self.df is None or "投稿内容" not in self.df.columns:
+        frames = self._frames()
+        if not workbook.collect_texts(frames, self.selected)[1]:
             self._update_status(
                 "「投稿内容」列が見つかりません", STATUS_COLORS["error"]
             )
             return
         self._enable_buttons(False)
-        total_rows = len(self.df)
-        category_flags = {name: [] for name in CATEGORY_NAMES}
-        category_scores = {name: [] for name in CATEGORY_NAMES}
-        ag_scores: list[int | None] = []
-        ag_reasons: list[str | None] = []
-        overall_scores: list[int | None] = []
-        for idx, row in self.df.iterrows():
-            text = row["投稿内容"]
-            mod_res, ag_res = await asyncio.gather(
-                services.moderate_text(text),
-                services.get_aggressiveness_score(text),
+        try:
+            result_store = store.open_store()
+            try:
+                results = await workbook.analyze_workbook(
+                    frames,
+                    self.selected,
+                    columns=self.columns,
+                    on_progress=self._report_progress,
+                    store=result_store,
+                )
+            finally:
+                if result_store is not None:
+                    result_store.close()
+        except Exception:  # noqa: BLE001
+            logger.exception("analysis failed")
+            self._update_status("分析に失敗しました", STATUS_COLORS["error"])
+            return
+        finally:
+            self._enable_buttons(True)
+        failed = sum(1 for res in results if res.error is not None)
+        pending = sum(1 for res in results if res.llm_pending)
+        notes = []
+        if failed:
+            notes.append(f"失敗 {failed}件は analysis_error 列を参照")
+        if pending:
+            notes.append(f"LLM未取得 {pending}件は llm_pending 列を参照")
+        if notes:
+            self._update_status(
+                f"分析が完了しました（{'、'.join(notes)}）",
+                STATUS_COLORS["error"],
             )
-
-            for name in CATEGORY_NAMES:
-                attr = name.replace("/", "_").replace("-", "_")
-                category_flags[name].append(getattr(mod_res.categories, attr))
-                category_scores[name].append(getattr(mod_res.scores, attr))
-
-            ag_scores.append(ag_res.score)
-            ag_reasons.append(ag_res.reason)
-            overall_scores.append(
-                services.aggregate_aggressiveness(mod_res.scores, ag_res.score)
+        else:
+            self._update_status(
+                "分析が完了しました", STATUS_COLORS["success"]
             )
 
-            progress = (idx + 1) / total_rows
-            self._update_progress(progress)
-            self._update_status(f"分析中... {idx + 1}/{total_rows}")
-            await asyncio.sleep(0)  # allow UI update
-
-        for name in CATEGORY_NAMES:
-            self.df[f"{name}_flag"] = category_flags[name]
-            self.df[f"{name}_score"] = category_scores[name]
-        self.df["aggressiveness_score"] = ag_scores
-        self.df["aggressiveness_reason"] = ag_reasons
-        self.df["aggressiveness_overall"] = overall_scores
-        self._update_status(
-            "分析が完了しました", STATUS_COLORS["success"]
-        )
-        self._enable_buttons(True)
+    def _report_progress(self, completed: int, total: int) -> None:
+        self._update_progress(completed / total)
+        self._update_status(f"分析中... {completed}/{total}")
@@ -0,0 +1,481 @@
+"""Concurrent row analysis shared by the GUI, the CLI and shard workers."""
+
+import asyncio
+import logging
+from collections.abc import Callable, Sequence
+from typing import TYPE_CHECKING
+
+from . import parsing, preflight, services, sharding
+from .config import settings
+from .constants import CATEGORY_NAMES
+from .circuit import CircuitOpenError
+from .logging_config import row_id
+from .models import AggressivenessResult, ModerationResult, RowResult
+from .store import ResultStore, text_hash
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[int, int], None]
+
+
+async def analyze_text(
+    text: str, moderation: ModerationResult | None = None
+) -> RowResult:
+    """Run moderation and LLM scoring for a single text.
+
+    ``moderation`` skips the moderation call when its result is already
+    known, e.g. from a batched cascade pass.
+
+    Texts longer than :attr:`kougeki.config.Settings.max_input_tokens` are
+    truncated before being sent to the chat model. A call that still fails
+    after :func:`kougeki.services.retry` gives up is recorded in
+    :attr:`RowResult.error` instead of being raised, keeping whatever the
+    other call returned. While the chat circuit breaker is open the row is
+    scored from moderation only and marked as pending instead.
+
+    When :attr:`~kougeki.config.Settings.escalation_model` is set, rows whose
+    first score falls in the borderline range or could not be parsed are
+    re-scored by that model; the first result is kept in
+    :attr:`RowResult.first_pass`.
+    """
+    prompt_text, truncated = preflight.truncate_text(text)
+    mod_res, ag_res = await asyncio.gather(
+        _resolved(moderation) if moderation is not None else services.moderate_text(text),
+        services.get_aggressiveness_score(prompt_text),
+        return_exceptions=True,
+    )
+    for outcome in (mod_res, ag_res):
+        if isinstance(outcome, asyncio.CancelledError):
+            raise outcome
+    if isinstance(ag_res, CircuitOpenError) and not isinstance(
+        mod_res, BaseException
+    ):
+        return _pending(mod_res, truncated)
+    errors = [
+        _describe(outcome)
+        for outcome in (mod_res, ag_res)
+        if isinstance(outcome, BaseException)
+    ]
+    if isinstance(mod_res, BaseException):
+        mod_res = None
+    if isinstance(ag_res, BaseException):
+        ag_res = AggressivenessResult(score=None, reason=None)
+    first_pass = None
+    if not errors and _needs_escalation(ag_res):
+        try:
+            escalated = await services.get_aggressiveness_score(
+                prompt_text, model=settings.escalation_model
+            )
+        except Exception:  # noqa: BLE001
+            logger.exception("escalation to %s failed", settings.escalation_model)
+        else:
+            first_pass, ag_res = ag_res, escalated
+    overall = (
+        services.aggregate_aggressiveness(mod_res.scores, ag_res.score)
+        if mod_res is not None
+        else None
+    )
+    return RowResult(
+        moderation=mod_res,
+        aggressiveness=ag_res,
+        overall=overall,
+        truncated=truncated,
+        error="; ".join(errors) or None,
+        first_pass=first_pass,
+    )
+
+
+def _pending(mod_res: ModerationResult, truncated: bool) -> RowResult:
+    """Degraded result used while the chat circuit is open.
+
+    The overall score is estimated from moderation alone and the LLM
+    columns are left empty with :attr:`RowResult.llm_pending` set so the
+    row can be backfilled later.
+    """
+    derived = services.derive_aggressiveness(mod_res.scores)
+    return RowResult(
+        moderation=mod_res,
+        aggressiveness=AggressivenessResult(score=None, reason=None, source="pending"),
+        overall=services.aggregate_aggressiveness(
+            mod_res.scores, derived.score, derived=True
+        ),
+        truncated=truncated,
+        llm_pending=True,
+    )
+
+
+def _needs_escalation(ag_res: AggressivenessResult) -> bool:
+    """Whether a first-tier score should be re-scored by the stronger model."""
+    if not settings.escalation_model:
+        return False
+    if ag_res.score is None:
+        return True
+    return settings.escalation_min_score <= ag_res.score <= settings.escalation_max_score
+
+
+async def _resolved(value):
+    return value
+
+
+def _describe(exc: BaseException) -> str:
+    return f"{type(exc).__name__}: {exc}"
+
+
+def _failed(exc: BaseException) -> RowResult:
+    return RowResult(
+        moderation=None,
+        aggressiveness=AggressivenessResult(score=None, reason=None),
+        overall=None,
+        error=_describe(exc),
+    )
+
+
+async def analyze_texts(
+    texts: Sequence[str],
+    concurrency: int | None = None,
+    on_progress: ProgressCallback | None = None,
+    row_ids: Sequence[int] | None = None,
+) -> list[RowResult]:
+    """Analyze ``texts`` concurrently and return results in input order.
+
+    With :attr:`~kougeki.config.Settings.cascade_enabled`, moderation runs
+    first in batches and only rows whose hostility signal falls between
+    ``cascade_clean_below`` and ``cascade_severe_above`` are sent to the
+    chat model; the others get a score derived from moderation.
+
+    Parameters
+    ----------
+    texts:
+        Texts to analyze.
+    concurrency:
+        Maximum number of rows (or moderation batches) in flight. Defaults to
+        :attr:`kougeki.config.Settings.concurrency`.
+    on_progress:
+        Called with ``(completed, total)`` after each row finishes.
+    row_ids:
+        Row number of each text in the caller's input, attached to log
+        records as ``row``. Defaults to the position in ``texts``.
+    """
+
+    total = len(texts)
+    semaphore = asyncio.Semaphore(max(1, concurrency or settings.concurrency))
+    results: list[RowResult | None] = [None] * total
+    moderations: list[ModerationResult | None] = [None] * total
+    completed = 0
+
+    def finish(idx: int, res: RowResult) -> None:
+        nonlocal completed
+        results[idx] = res
+        completed += 1
+        if on_progress is not None:
+            on_progress(completed, total)
+
+    if settings.cascade_enabled:
+        moderations = await moderate_batches(texts, semaphore)
+        chat_rows = []
+        for idx, mod_res in enumerate(moderations):
+            derived = _cascade_decision(mod_res)
+            if derived is None:
+                chat_rows.append(idx)
+                continue
+            finish(
+                idx,
+                RowResult(
+                    moderation=mod_res,
+                    aggressiveness=derived,
+                    overall=services.aggregate_aggressiveness(
+                        mod_res.scores, derived.score, derived=True
+                    ),
+                ),
+            )
+        logger.info(
+            "cascade: %s/%s rows scored from moderation "
+            "(clean < %.2f, severe >= %.2f), %s sent to %s",
+            total - len(chat_rows),
+            total,
+            settings.cascade_clean_below,
+            settings.cascade_severe_above,
+            len(chat_rows),
+            settings.chat_model,
+        )
+    else:
+        chat_rows = list(range(total))
+
+    async def worker(idx: int) -> None:
+        # Each worker runs in its own task, so this only tags its own logs.
+        row_id.set(row_ids[idx] if row_ids is not None else idx)
+        async with semaphore:
+            try:
+                res = await analyze_text(texts[idx], moderations[idx])
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("row %s failed", row_id.get())
+                res = _failed(exc)
+        finish(idx, res)
+
+    await asyncio.gather(*(worker(idx) for idx in chat_rows))
+    return results  # type: ignore[return-value]
+
+
+async def moderate_batches(
+    texts: Sequence[str], semaphore: asyncio.Semaphore
+) -> list[ModerationResult | None]:
+    """Moderate ``texts`` in batches; rows of a failed batch are ``None``."""
+    size = max(1, settings.moderation_batch_size)
+    moderations: list[ModerationResult | None] = [None] * len(texts)
+
+    async def batch(start: int) -> None:
+        chunk = [str(text) for text in texts[start : start + size]]
+        async with semaphore:
+            try:
+                batch_results = await services.moderate_texts(chunk)
+            except Exception:  # noqa: BLE001
+                logger.exception("moderation batch at row %s failed", start)
+                return
+        moderations[start : start + len(batch_results)] = batch_results
+
+    await asyncio.gather(*(batch(start) for start in range(0, len(texts), size)))
+    return moderations
+
+
+def _cascade_decision(
+    mod_res: ModerationResult | None,
+) -> AggressivenessResult | None:
+    """Return a derived score for clear-cut rows, ``None`` if the LLM is needed."""
+    if mod_res is None:
+        return None
+    signal = services.moderation_signal(mod_res.scores)
+    if (
+        signal < settings.cascade_clean_below
+        or signal >= settings.cascade_severe_above
+    ):
+        return services.derive_aggressiveness(mod_res.scores)
+    return None
+
+
+async def analyze(
+    texts: Sequence[str],
+    *,
+    shards: int | None = None,
+    concurrency: int | None = None,
+    requests_per_second: float | None = None,
+    on_progress: ProgressCallback | None = None,
+    store: ResultStore | None = None,
+) -> list[RowResult]:
+    """Analyze ``texts`` using the store as a warm cache and sharding if set.
+
+    Texts already in ``store`` for the current model and prompt version are
+    answered from it, unless the cascade or escalation settings would now
+    route them differently; the rest are analyzed in-process or, when ``shards``
+    (default :attr:`kougeki.config.Settings.shard_count`) is above one,
+    across worker processes. Rows that failed are retried once more at
+    :attr:`~kougeki.config.Settings.retry_failed_concurrency` when
+    :attr:`~kougeki.config.Settings.retry_failed_rows` is set. Successful
+    new results are written back to ``store``.
+    """
+
+    texts = list(texts)
+    total = len(texts)
+    results: list[RowResult | None] = [None] * total
+    if store is not None:
+        models = [settings.chat_model]
+        if settings.escalation_model:
+            models.append(settings.escalation_model)
+        if settings.cascade_enabled:
+            models.append(settings.moderation_model)
+        cached = store.lookup(
+            texts, models, services.PROMPT_VERSION, settings.max_input_tokens
+        )
+        for idx, text in enumerate(texts):
+            res = cached.get(text_hash(text))
+            # A row derived from moderation is only reusable while the
+            # cascade thresholds still leave it outside the LLM band.
+            if (
+                res is not None
+                and res.aggressiveness.source == "moderation"
+                and _cascade_decision(res.moderation) is None
+            ):
+                res = None
+            # Likewise a first-tier score in the escalation band (stored
+            # before escalation was enabled, or when it failed) is re-scored.
+            if (
+                res is not None
+                and res.aggressiveness.model == settings.chat_model
+                and res.aggressiveness.model != settings.escalation_model
+                and _needs_escalation(res.aggressiveness)
+            ):
+                res = None
+            results[idx] = res
+    missing = [idx for idx, res in enumerate(results) if res is None]
+    offset = total - len(missing)
+    if offset:
+        logger.info("%s/%s rows answered from the results store", offset, total)
+
+    def report(completed: int, _total: int) -> None:
+        if on_progress is not None:
+            on_progress(offset + completed, total)
+
+    pending = [texts[idx] for idx in missing]
+    shards = shards or settings.shard_count
+    if shards > 1 and settings.cassette_mode.lower() == "record":
+        logger.warning(
+            "recording a cassette needs a single process; not sharding across %s",
+            shards,
+        )
+        shards = 1
+    if not pending:
+        fresh: list[RowResult] = []
+    elif shards > 1:
+        fresh = await asyncio.to_thread(
+            sharding.analyze_sharded,
+            pending,
+            shards=shards,
+            requests_per_second=requests_per_second,
+            concurrency=concurrency,
+            on_progress=report,
+            row_ids=missing,
+        )
+    else:
+        fresh = await analyze_texts(
+            pending, concurrency, on_progress=report, row_ids=missing
+        )
+    for idx, res in zip(missing, fresh):
+        results[idx] = res
+
+    failed = [idx for idx in missing if results[idx].error is not None]
+    if failed and settings.retry_failed_rows:
+        logger.warning(
+            "%s rows failed; retrying them with concurrency %s",
+            len(failed),
+            settings.retry_failed_concurrency,
+        )
+        retried = await analyze_texts(
+            [texts[idx] for idx in failed],
+            settings.retry_failed_concurrency,
+            row_ids=failed,
+        )
+        for idx, res in zip(failed, retried):
+            results[idx] = res
+        failed = [idx for idx in failed if results[idx].error is not None]
+    if failed:
+        logger.warning("%s/%s rows could not be analyzed", len(failed), total)
+    for model, policy in services.hedging_policies.items():
+        logger.info("hedging %s: %s", model, policy.stats())
+    logger.info("chat answers parsed: %s", parsing.parse_stats.as_dict())
+
+    pending_llm = sum(1 for res in results if res.llm_pending)
+    if pending_llm:
+        logger.warning(
+            "%s rows scored from moderation only while the chat endpoint "
+            "was unavailable; backfill them later",
+            pending_llm,
+        )
+
+    if store is not None:
+        succeeded = [
+            idx
+            for idx in missing
+            if results[idx].error is None and not results[idx].llm_pending
+        ]
+        if succeeded:
+            store.add_many(
+                [texts[idx] for idx in succeeded],
+                [results[idx] for idx in succeeded],
+                settings.chat_model,
+                services.PROMPT_VERSION,
+                settings.max_input_tokens,
+            )
+    return results  # type: ignore[return-value]
+
+
+#: Columns written by the original single-file script.
+LEGACY_COLUMNS = [
+    f"{name}_{kind}" for name in CATEGORY_NAMES for kind in ("flag", "score")
+] + ["aggressiveness_score", "aggressiveness_reason"]
+
+#: Columns marking failed and degraded rows, written even when the output
+#: columns are limited so that such rows can be found and backfilled.
+STATUS_COLUMNS = ["analysis_error", "llm_pending"]
+
+
+def result_record(res: RowResult) -> dict[str, object]:
+    """Flatten ``res`` into a mapping of output column name to value."""
+    record: dict[str, object] = {}
+    for name in CATEGORY_NAMES:
+        attr = name.replace("/", "_").replace("-", "_")
+        if res.moderation is None:
+            record[f"{name}_flag"] = None
+            record[f"{name}_score"] = None
+        else:
+            record[f"{name}_flag"] = getattr(res.moderation.categories, attr)
+            record[f"{name}_score"] = getattr(res.moderation.scores, attr)
+    record["aggressiveness_score"] = res.aggressiveness.score
+    record["aggressiveness_reason"] = res.aggressiveness.reason
+    record["aggressiveness_overall"] = res.overall
+    record["aggressiveness_source"] = res.aggressiveness.source
+    record["aggressiveness_model"] = res.aggressiveness.model
+    first = res.first_pass
+    record["aggressiveness_score_first_pass"] = first.score if first else None
+    record["aggressiveness_reason_first_pass"] = first.reason if first else None
+    record["input_truncated"] = res.truncated
+    record["analysis_error"] = res.error
+    record["llm_pending"] = res.llm_pending
+    return record
+
+
+def apply_results(
+    df: "pd.DataFrame",
+    results: Sequence[RowResult],
+    index: Sequence | None = None,
+    columns: Sequence[str] | None = None,
+) -> None:
+    """Write analysis ``results`` into ``df`` as new columns.
+
+    ``index`` limits the update to those rows, leaving the others as they
+    are; by default ``results`` cover every row. ``columns`` limits which
+    output columns are written, e.g. :data:`LEGACY_COLUMNS`;
+    :data:`STATUS_COLUMNS` are always written.
+    """
+    import pandas as pd
+
+    records = [result_record(res) for res in results]
+    if not records:
+        return
+    if columns is not None:
+        columns = [*columns, *(c for c in STATUS_COLUMNS if c not in columns)]
+    for column in columns or records[0]:
+        values = [record[column] for record in records]
+        if index is None:
+            df[column] = values
+        else:
+            if column not in df.columns:
+                df[column] = None
+            df[column] = df[column].astype(object)
+            df.loc[list(index), column] = pd.Series(values, index=list(index), dtype=object)
+
+
+def pending_rows(df: "pd.DataFrame") -> list:
+    """Return the index of rows still waiting for an LLM score."""
+    if "llm_pending" not in df.columns:
+        return []
+    return df.index[df["llm_pending"].fillna(False).astype(bool)].tolist()
+
+
+async def backfill(
+    df: "pd.DataFrame",
+    on_progress: ProgressCallback | None = None,
+    store: ResultStore | None = None,
+) -> int:
+    """Re-analyze rows marked ``llm_pending`` in ``df`` and update them.
+
+    Returns the number of rows that were attempted.
+    """
+    index = pending_rows(df)
+    if not index:
+        return 0
+    texts = df.loc[index, "投稿内容"].tolist()
+    results = await analyze(texts, on_progress=on_progress, store=store)
+    apply_results(df, results, index)
+    return len(index)
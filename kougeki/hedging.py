@@ -0,0 +1,130 @@
+"""Hedged requests to cut tail latency."""
+
+import asyncio
+import logging
+import statistics
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class HedgingPolicy:
+    """Fire a duplicate request when the first one is slower than usual.
+
+    If a call has not finished after the observed ``quantile`` of recent
+    latencies, a second identical call is started and whichever finishes
+    first wins; the other is cancelled. Hedges are capped at ``budget``
+    extra requests as a fraction of all requests.
+
+    Parameters
+    ----------
+    budget:
+        Maximum hedged requests as a fraction of all requests.
+    quantile:
+        Latency quantile after which a request is hedged.
+    min_samples:
+        Latencies observed before hedging starts.
+    window:
+        Number of recent latencies considered.
+    """
+
+    def __init__(
+        self,
+        budget: float = 0.05,
+        quantile: float = 0.95,
+        min_samples: int = 20,
+        window: int = 500,
+    ):
+        self.budget = budget
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def hedge_delay(self) -> float | None:
+        """Seconds to wait before hedging, or ``None`` if hedging is off."""
+        if len(self.latencies) < max(2, self.min_samples):
+            return None
+        if self.hedges + 1 > self.budget * self.requests:
+            return None
+        cuts = statistics.quantiles(self.latencies, n=100)
+        return cuts[min(98, max(0, round(self.quantile * 100) - 1))]
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_rate": self.hedges / self.requests if self.requests else 0.0,
+        }
+
+    def add_counts(self, stats: dict[str, float]) -> None:
+        """Add request counters reported by another process."""
+        self.requests += int(stats.get("requests", 0))
+        self.hedges += int(stats.get("hedges", 0))
+        self.hedge_wins += int(stats.get("hedge_wins", 0))
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[T]],
+        throttle: Callable[[], Awaitable[None]] | None = None,
+    ) -> T:
+        """Await ``call()``, hedging it with a second ``call()`` when slow.
+
+        ``throttle``, such as a rate limiter's ``acquire``, is awaited before
+        each copy is sent. Only ``call()`` itself is timed, so waiting for a
+        request slot neither triggers hedges nor skews the latencies.
+        """
+        self.requests += 1
+        if throttle is not None:
+            await throttle()
+        delay = self.hedge_delay()
+        primary = asyncio.ensure_future(self._timed(call))
+        if delay is None:
+            result, latency = await primary
+            self.latencies.append(latency)
+            return result
+
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                self.hedges += 1
+                pending.add(asyncio.ensure_future(self._timed(call, throttle)))
+            error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    if task is not primary:
+                        self.hedge_wins += 1
+                    result, latency = task.result()
+                    self.latencies.append(latency)
+                    return result
+            assert error is not None
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    @staticmethod
+    async def _timed(
+        call: Callable[[], Awaitable[T]],
+        throttle: Callable[[], Awaitable[None]] | None = None,
+    ) -> tuple[T, float]:
+        if throttle is not None:
+            await throttle()
+        started = time.perf_counter()
+        result = await call()
+        return result, time.perf_counter() - started
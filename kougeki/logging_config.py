@@ -1,15 +1,193 @@
+"""Non-blocking logging setup.
+
+Records are put on a queue by the calling thread and written by a
+background :class:`~logging.handlers.QueueListener`, so file I/O and
+traceback formatting never run on the event loop. Warnings and errors
+repeated within ``LOG_DEDUP_SECONDS`` are collapsed, and ``LOG_JSON``
+switches the output to JSON lines that include the id of the row being
+analyzed. Shard worker processes send their records to the parent through
+a :mod:`multiprocessing` queue (:func:`setup_worker_logging` and
+:func:`relay_worker_logs`), so they go through the same handlers.
+"""
+
+import atexit
+import copy
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 from .config import settings
 
+#: Row analyzed by the current task; added to log records as ``row``.
+row_id: ContextVar[int | None] = ContextVar("row_id", default=None)
+
+_listener: QueueListener | None = None
+_queue_handler: QueueHandler | None = None
+_handlers: list[logging.Handler] = []
+
+
+class RowFilter(logging.Filter):
+    """Attach :data:`row_id` of the calling task to each record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "row", None) is None:
+            record.row = row_id.get()
+        return True
+
+
+class RepeatFilter(logging.Filter):
+    """Drop warnings and errors repeated within ``interval`` seconds.
+
+    Records count as repeats when they share the logger, level, message
+    template and exception type, so retries of different rows collapse into
+    one line. The next record let through notes how many were dropped.
+    """
+
+    def __init__(self, interval: float):
+        super().__init__()
+        self.interval = interval
+        self._seen: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.interval <= 0 or record.levelno < logging.WARNING:
+            return True
+        exc_type = (
+            record.exc_info[0].__name__
+            if record.exc_info
+            else getattr(record, "exc_type", None)
+        )
+        template = getattr(record, "template", None) or str(record.msg)
+        key = (record.name, record.levelno, template, exc_type)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is not None and now - entry[0] < self.interval:
+                entry[1] += 1
+                return False
+            self._seen[key] = [now, 0]
+        suppressed = entry[1] if entry is not None else 0
+        record.suppressed = suppressed
+        if suppressed:
+            record.msg = f"{record.msg} [{suppressed} similar messages suppressed]"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "row", None) is not None:
+            entry["row"] = record.row
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Queue records with their message merged but tracebacks unformatted.
+
+    :meth:`QueueHandler.prepare` formats the whole record, traceback
+    included, on the calling thread; here that is left to the listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class _WorkerQueueHandler(QueueHandler):
+    """Queue picklable records for the parent process.
+
+    The message is merged and the traceback formatted in the worker; the
+    message template and exception type are kept for :class:`RepeatFilter`.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.template = str(record.msg)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_type = record.exc_info[0].__name__
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class _RelayHandler(logging.Handler):
+    def emit(self, record: logging.LogRecord) -> None:
+        logging.getLogger(record.name).handle(record)
+
+
+def setup_worker_logging(log_queue, level: int) -> None:
+    """Send the records of this worker process to ``log_queue``.
+
+    ``log_queue`` is a :mod:`multiprocessing` queue read in the parent by
+    :func:`relay_worker_logs`.
+    """
+    handler = _WorkerQueueHandler(log_queue)
+    handler.addFilter(RowFilter())
+    root_logger = logging.getLogger()
+    root_logger.handlers.clear()
+    root_logger.addHandler(handler)
+    root_logger.setLevel(level)
+
+
+def relay_worker_logs(log_queue) -> QueueListener:
+    """Pass records from worker processes to this process's loggers.
+
+    Returns the started listener; stop it once the workers have exited.
+    """
+    listener = QueueListener(log_queue, _RelayHandler())
+    listener.start()
+    return listener
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the background writer."""
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+        for handler in _handlers:
+            handler.close()
+        _handlers.clear()
+
 
 def setup_logging() -> None:
-    """Configure root logger with rotating file and console handlers."""
+    """Configure the root logger with a queue feeding file and console handlers."""
+    global _listener, _queue_handler
+    stop_logging()
     level = getattr(logging, settings.log_level.upper(), logging.INFO)
-    formatter = logging.Formatter(
-        "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
-    )
+    if settings.log_json:
+        formatter: logging.Formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+        )
     root_logger = logging.getLogger()
     root_logger.setLevel(level)
 
@@ -17,8 +195,19 @@ def setup_logging() -> None:
         settings.log_file, maxBytes=1_000_000, backupCount=3, encoding="utf-8"
     )
     file_handler.setFormatter(formatter)
-    root_logger.addHandler(file_handler)
 
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
+    _handlers.extend([file_handler, console_handler])
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _queue_handler = _DeferredQueueHandler(log_queue)
+    _queue_handler.addFilter(RowFilter())
+    _queue_handler.addFilter(RepeatFilter(settings.log_dedup_seconds))
+    root_logger.addHandler(_queue_handler)
+
+    _listener = QueueListener(log_queue, *_handlers, respect_handler_level=True)
+    _listener.start()
+
+
+atexit.register(stop_logging)
@@ -34,3 +34,16 @@ class ModerationResult:
 class AggressivenessResult:
     score: Optional[int]
     reason: Optional[str]
+    model: Optional[str] = None
+    source: str = "llm"
+
+
+@dataclass(slots=True)
+class RowResult:
+    moderation: Optional[ModerationResult]
+    aggressiveness: AggressivenessResult
+    overall: Optional[int]
+    truncated: bool = False
+    error: Optional[str] = None
+    first_pass: Optional[AggressivenessResult] = None
+    llm_pending: bool = False
@@ -0,0 +1,139 @@
+"""Fast, validated decoding of the chat model's JSON answers.
+
+Answers are decoded with ``orjson`` when it is installed and validated
+against the expected ``{"score": int, "reason": str}`` shape. Slightly
+malformed answers (code fences, text around the JSON, numeric strings,
+out-of-range scores) are salvaged instead of discarded, and
+:data:`parse_stats` counts how many answers were clean, salvaged or lost.
+"""
+
+import json
+import logging
+import math
+import re
+from dataclasses import dataclass
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+MIN_SCORE = 0
+MAX_SCORE = 9
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+_SCORE = re.compile(r"[\"']?(?:score|スコア)[\"']?\s*[:：]\s*[\"']?(-?\d+(?:\.\d+)?)")
+_REASON_QUOTED = re.compile(r"[\"']?(?:reason|理由)[\"']?\s*[:：]\s*\"((?:[^\"\\]|\\.)*)\"")
+_REASON_LINE = re.compile(r"[\"']?(?:reason|理由)[\"']?\s*[:：]\s*\"?([^\"\n}]+)")
+
+
+@dataclass(slots=True)
+class ParseStats:
+    ok: int = 0
+    salvaged: int = 0
+    lost: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return {"ok": self.ok, "salvaged": self.salvaged, "lost": self.lost}
+
+    def add(self, counts: dict[str, int]) -> None:
+        """Add counts reported by another process."""
+        self.ok += counts.get("ok", 0)
+        self.salvaged += counts.get("salvaged", 0)
+        self.lost += counts.get("lost", 0)
+
+
+#: Process-wide counters of parse outcomes.
+parse_stats = ParseStats()
+
+
+def loads(data: str | bytes):
+    """Decode JSON with ``orjson`` when available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _coerce_score(value) -> tuple[int | None, bool]:
+    """Return ``(score, exact)``; ``exact`` is ``False`` if it was coerced."""
+    if isinstance(value, bool):
+        return None, False
+    if isinstance(value, int):
+        exact = MIN_SCORE <= value <= MAX_SCORE
+        return max(MIN_SCORE, min(MAX_SCORE, value)), exact
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None, False
+    if not math.isfinite(number):
+        return None, False
+    return max(MIN_SCORE, min(MAX_SCORE, round(number))), False
+
+
+def _from_mapping(data) -> tuple[int | None, str | None, bool]:
+    if not isinstance(data, dict):
+        return None, None, False
+    score, exact = _coerce_score(data.get("score"))
+    reason = data.get("reason")
+    if reason is not None and not isinstance(reason, str):
+        reason = str(reason)
+        exact = False
+    return score, reason, exact and reason is not None
+
+
+def _decode(text: str):
+    try:
+        return loads(text)
+    except ValueError:
+        return None
+
+
+def _salvage(content: str) -> tuple[int | None, str | None]:
+    fenced = _FENCE.search(content)
+    candidates = [fenced.group(1)] if fenced else []
+    start, end = content.find("{"), content.rfind("}")
+    if 0 <= start < end:
+        candidates.append(content[start : end + 1])
+    for candidate in candidates:
+        score, reason, _ = _from_mapping(_decode(candidate.strip()))
+        if score is not None:
+            return score, reason
+
+    match = _SCORE.search(content)
+    if match is None:
+        return None, None
+    score, _ = _coerce_score(match.group(1))
+    reason_match = _REASON_QUOTED.search(content) or _REASON_LINE.search(content)
+    reason = reason_match.group(1).strip() if reason_match else None
+    return score, reason
+
+
+def parse_aggressiveness(content: str | None) -> tuple[int | None, str | None]:
+    """Extract ``(score, reason)`` from a chat answer.
+
+    The score is clamped to 0-9. Returns ``(None, None)`` only when no score
+    can be recovered at all.
+    """
+    if not content:
+        parse_stats.lost += 1
+        return None, None
+
+    score, reason, exact = _from_mapping(_decode(content))
+    if score is not None:
+        if exact:
+            parse_stats.ok += 1
+        else:
+            parse_stats.salvaged += 1
+        return score, reason
+
+    score, reason = _salvage(content)
+    if score is not None:
+        parse_stats.salvaged += 1
+        logger.info("salvaged aggressiveness answer: %r", content[:200])
+        return score, reason
+
+    parse_stats.lost += 1
+    logger.warning("could not parse aggressiveness answer: %r", content[:200])
+    return None, None
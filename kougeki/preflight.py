@@ -0,0 +1,156 @@
+"""Token counting, truncation and cost/time estimates before a run.
+
+``tiktoken`` is imported on first use and gives exact counts when
+installed; otherwise a fast character-based approximation is used (about
+one token per Japanese character and four ASCII characters per token).
+"""
+
+import math
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+
+from . import services
+from .config import settings
+
+_NOT_LOADED = object()
+_encoding = _NOT_LOADED
+
+
+def _get_encoding():
+    """Load the ``tiktoken`` encoding on first use; ``None`` if unavailable."""
+    global _encoding
+    if _encoding is _NOT_LOADED:
+        _encoding = None
+        try:
+            import tiktoken
+        except ImportError:
+            return None
+        try:
+            _encoding = tiktoken.encoding_for_model(settings.chat_model)
+        except Exception:  # noqa: BLE001 - unknown model or offline
+            try:
+                _encoding = tiktoken.get_encoding("o200k_base")
+            except Exception:  # noqa: BLE001
+                _encoding = None
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Return the (approximate) number of tokens in ``text``."""
+    text = str(text)
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
+
+
+def truncate_text(text: str, max_tokens: int | None = None) -> tuple[str, bool]:
+    """Cut ``text`` to ``max_tokens`` tokens.
+
+    Returns the possibly shortened text and whether it was truncated.
+    ``max_tokens`` defaults to :attr:`kougeki.config.Settings.max_input_tokens`;
+    ``0`` disables truncation.
+    """
+    text = str(text)
+    limit = settings.max_input_tokens if max_tokens is None else max_tokens
+    if limit <= 0:
+        return text, False
+    tokens = count_tokens(text)
+    if tokens <= limit:
+        return text, False
+    encoding = _get_encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text)[:limit]), True
+    # Shrink proportionally, then trim until the estimate fits.
+    cut = text[: max(1, len(text) * limit // tokens)]
+    while count_tokens(cut) > limit:
+        cut = cut[:-1]
+    return cut, True
+
+
+def prompt_overhead_tokens() -> int:
+    """Tokens sent with every chat request in addition to the post itself."""
+    prompt = services.AGGRESSIVE_PROMPT.format(
+        text="", examples=services.FEW_SHOT_EXAMPLES
+    )
+    return count_tokens(prompt) + count_tokens(services.SYSTEM_PROMPT)
+
+
+@dataclass(slots=True)
+class PreflightReport:
+    rows: int
+    input_tokens: int
+    output_tokens: int
+    truncated_rows: list[int] = field(default_factory=list)
+    cost_usd: float = 0.0
+    seconds: float = 0.0
+
+    def summary(self) -> str:
+        minutes, seconds = divmod(round(self.seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        return "\n".join(
+            [
+                f"対象件数: {self.rows}件",
+                f"推定入力トークン: {self.input_tokens:,}",
+                f"推定出力トークン: {self.output_tokens:,}",
+                f"上限超過で切り詰める投稿: {len(self.truncated_rows)}件",
+                f"推定コスト: ${self.cost_usd:,.2f}",
+                f"推定所要時間: {hours}時間{minutes}分{seconds}秒",
+            ]
+        )
+
+
+def estimate(
+    texts: Sequence[str],
+    concurrency: int | None = None,
+    shards: int | None = None,
+    requests_per_second: float | None = None,
+) -> PreflightReport:
+    """Estimate tokens, cost and wall time for analyzing ``texts``.
+
+    Wall time is the slowest of three limits: rows in flight across all
+    shards at :attr:`~kougeki.config.Settings.expected_latency_seconds`
+    each, the shared requests-per-second budget (two requests per row) and
+    the tokens-per-minute budget.
+    """
+
+    concurrency = concurrency or settings.concurrency
+    shards = shards or settings.shard_count
+    if requests_per_second is None:
+        requests_per_second = settings.requests_per_second
+    overhead = prompt_overhead_tokens()
+    limit = settings.max_input_tokens
+
+    input_tokens = 0
+    truncated: list[int] = []
+    for idx, text in enumerate(texts):
+        tokens = count_tokens(text)
+        if 0 < limit < tokens:
+            truncated.append(idx)
+            tokens = limit
+        input_tokens += tokens + overhead
+    rows = len(texts)
+    output_tokens = rows * settings.expected_output_tokens
+
+    cost = (
+        input_tokens * settings.chat_input_price_per_million
+        + output_tokens * settings.chat_output_price_per_million
+    ) / 1_000_000
+
+    seconds = rows * settings.expected_latency_seconds / max(1, concurrency * shards)
+    if requests_per_second > 0:
+        seconds = max(seconds, rows * 2 / requests_per_second)
+    if settings.tokens_per_minute > 0:
+        seconds = max(
+            seconds, (input_tokens + output_tokens) / settings.tokens_per_minute * 60
+        )
+
+    return PreflightReport(
+        rows=rows,
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        truncated_rows=truncated,
+        cost_usd=cost,
+        seconds=seconds,
+    )
@@ -0,0 +1,47 @@
+"""Request pacing shared by the service layer and worker processes."""
+
+import asyncio
+import time
+
+
+class RateLimiter:
+    """Space out requests evenly to stay under ``requests_per_second``.
+
+    Each call to :meth:`acquire` reserves the next free time slot and sleeps
+    until it arrives, so concurrent coroutines are released one interval
+    apart instead of bursting.
+    """
+
+    def __init__(self, requests_per_second: float):
+        self.interval = 1.0 / requests_per_second
+        self._next_slot = 0.0
+
+    def _reserve(self) -> float:
+        now = time.time()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        return slot - now
+
+    async def acquire(self) -> None:
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class SharedRateLimiter(RateLimiter):
+    """:class:`RateLimiter` whose budget is shared between processes.
+
+    The next free slot lives in a :func:`multiprocessing.Value` so that all
+    shards draw from a single requests-per-second budget.
+    """
+
+    def __init__(self, requests_per_second: float, next_slot):
+        super().__init__(requests_per_second)
+        self._shared_slot = next_slot
+
+    def _reserve(self) -> float:
+        with self._shared_slot.get_lock():
+            now = time.time()
+            slot = max(now, self._shared_slot.value)
+            self._shared_slot.value = slot + self.interval
+        return slot - now
@@ -0,0 +1,347 @@
+"""Approximate reports from a stratified random sample.
+
+Instead of scoring every row, :func:`sample_estimate` splits the texts
+into strata (by length, or by the moderation hostility signal from a
+cheap batched moderation pass), scores a proportionally allocated random
+sample and estimates the distribution of ``aggressiveness_overall`` with
+confidence intervals. With a target margin it keeps drawing more rows
+until the interval for the aggressive share is narrow enough.
+"""
+
+import asyncio
+import logging
+import math
+import random
+import statistics
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+
+from . import engine, services
+from .config import settings
+from .store import ResultStore
+
+logger = logging.getLogger(__name__)
+
+#: Character lengths separating the length strata.
+LENGTH_EDGES = (50, 200, 1000)
+
+STRATEGIES = ("length", "moderation")
+
+
+@dataclass(slots=True)
+class Estimate:
+    value: float
+    low: float
+    high: float
+
+    @property
+    def margin(self) -> float:
+        return (self.high - self.low) / 2
+
+
+@dataclass(slots=True)
+class SampleReport:
+    population: int
+    scored: int
+    failed: int
+    threshold: int
+    confidence: float
+    aggressive_share: Estimate
+    mean: Estimate
+    distribution: dict[int, Estimate] = field(default_factory=dict)
+    #: ``{stratum: (population, scored)}``
+    strata: dict[str, tuple[int, int]] = field(default_factory=dict)
+
+    def summary(self) -> str:
+        level = f"{self.confidence:.0%}"
+        share = self.aggressive_share
+        lines = [
+            f"母集団: {self.population}件",
+            f"採点した標本: {self.scored}件（失敗 {self.failed}件）",
+            f"攻撃的（スコア{self.threshold}以上）の割合: {share.value:.1%}"
+            f"（{level}信頼区間 {share.low:.1%}〜{share.high:.1%}）",
+            f"平均スコア: {self.mean.value:.2f}"
+            f"（{level}信頼区間 {self.mean.low:.2f}〜{self.mean.high:.2f}）",
+            "スコア分布:",
+        ]
+        for score, est in self.distribution.items():
+            lines.append(f"  {score}: {est.value:.1%} (±{est.margin:.1%})")
+        lines.append("層別の件数（母集団/標本）:")
+        for name, (size, scored) in self.strata.items():
+            lines.append(f"  {name}: {size}/{scored}")
+        return "\n".join(lines)
+
+
+def _length_labels() -> list[str]:
+    bounds = (0, *LENGTH_EDGES)
+    labels = [f"{lo}-{hi - 1}文字" for lo, hi in zip(bounds, LENGTH_EDGES)]
+    return labels + [f"{LENGTH_EDGES[-1]}文字以上"]
+
+
+def _moderation_labels() -> list[str]:
+    clean, severe = settings.cascade_clean_below, settings.cascade_severe_above
+    return [
+        f"moderation <{clean:g}",
+        f"moderation {clean:g}-{severe:g}",
+        f"moderation >={severe:g}",
+        "moderation unknown",
+    ]
+
+
+def length_strata(texts: Sequence[str]) -> list[str]:
+    """Label each text with its length bucket."""
+    labels = _length_labels()
+    return [
+        labels[sum(len(str(text)) >= edge for edge in LENGTH_EDGES)]
+        for text in texts
+    ]
+
+
+async def moderation_strata(
+    texts: Sequence[str], concurrency: int | None = None
+) -> list[str]:
+    """Label each text with its moderation band from a batched pass.
+
+    Bands are split at the cascade thresholds; rows whose moderation batch
+    failed form their own stratum.
+    """
+    clean, severe = settings.cascade_clean_below, settings.cascade_severe_above
+    low, mid, high, unknown = _moderation_labels()
+    semaphore = asyncio.Semaphore(max(1, concurrency or settings.concurrency))
+    moderations = await engine.moderate_batches(texts, semaphore)
+    out = []
+    for mod_res in moderations:
+        if mod_res is None:
+            out.append(unknown)
+            continue
+        signal = services.moderation_signal(mod_res.scores)
+        out.append(low if signal < clean else mid if signal < severe else high)
+    return out
+
+
+def allocate(sizes: dict[str, int], total: int) -> dict[str, int]:
+    """Split ``total`` draws across strata in proportion to their sizes.
+
+    Every stratum gets at least two draws (or all its rows) so its
+    variance can be estimated.
+    """
+    population = sum(sizes.values())
+    if population == 0:
+        return {name: 0 for name in sizes}
+    return {
+        name: min(size, max(min(2, size), round(total * size / population)))
+        for name, size in sizes.items()
+    }
+
+
+def stratified_estimate(
+    sizes: dict[str, int],
+    values: dict[str, list[float]],
+    confidence: float = 0.95,
+    bounds: tuple[float, float] | None = None,
+) -> Estimate:
+    """Estimate the population mean from per-stratum sample ``values``.
+
+    Uses the stratified mean with a finite population correction and a
+    normal interval; shares use :func:`stratified_share` instead. Strata
+    without scored rows are left out and the weights of the others
+    renormalized. ``bounds`` clamps the interval.
+    """
+    sampled = {name: vals for name, vals in values.items() if vals}
+    covered = sum(sizes[name] for name in sampled)
+    if not covered:
+        return Estimate(math.nan, math.nan, math.nan)
+    mean = 0.0
+    variance = 0.0
+    for name, vals in sampled.items():
+        weight = sizes[name] / covered
+        n = len(vals)
+        mean += weight * statistics.fmean(vals)
+        if n > 1:
+            fpc = 1 - n / sizes[name]
+            variance += weight**2 * fpc * statistics.variance(vals) / n
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+    half = z * math.sqrt(variance)
+    low, high = mean - half, mean + half
+    if bounds is not None:
+        low, high = max(bounds[0], low), min(bounds[1], high)
+    return Estimate(mean, low, high)
+
+
+def stratified_share(
+    sizes: dict[str, int],
+    hits: dict[str, tuple[int, int]],
+    confidence: float = 0.95,
+) -> Estimate:
+    """Estimate a population share from per-stratum ``(hits, scored)`` counts.
+
+    The point estimate is the stratified share. The interval is a Wilson
+    interval on the effective sample size implied by the stratified
+    variance, where each stratum's variance uses the Agresti-Coull adjusted
+    share ``(x + z²/2) / (n + z²)``. A stratum whose sampled rows all agree
+    therefore still contributes uncertainty; only a census (finite
+    population correction of zero) gives a zero-width interval.
+    """
+    sampled = {name: counts for name, counts in hits.items() if counts[1]}
+    covered = sum(sizes[name] for name in sampled)
+    if not covered:
+        return Estimate(math.nan, math.nan, math.nan)
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+    share = 0.0
+    adjusted = 0.0
+    variance = 0.0
+    for name, (x, n) in sampled.items():
+        weight = sizes[name] / covered
+        tilde = (x + z**2 / 2) / (n + z**2)
+        share += weight * x / n
+        adjusted += weight * tilde
+        fpc = 1 - n / sizes[name]
+        variance += weight**2 * fpc * tilde * (1 - tilde) / (n + z**2)
+    if variance <= 0:
+        return Estimate(share, share, share)
+    n_eff = adjusted * (1 - adjusted) / variance
+    denom = 1 + z**2 / n_eff
+    center = (share + z**2 / (2 * n_eff)) / denom
+    half = z / denom * math.sqrt(share * (1 - share) / n_eff + z**2 / (4 * n_eff**2))
+    return Estimate(share, max(0.0, center - half), min(1.0, center + half))
+
+
+def _report(
+    sizes: dict[str, int],
+    scores: dict[str, list[int]],
+    failed: int,
+    threshold: int,
+    confidence: float,
+) -> SampleReport:
+    def share(pred) -> Estimate:
+        hits = {
+            name: (sum(1 for score in vals if pred(score)), len(vals))
+            for name, vals in scores.items()
+        }
+        return stratified_share(sizes, hits, confidence)
+
+    return SampleReport(
+        population=sum(sizes.values()),
+        scored=sum(len(vals) for vals in scores.values()),
+        failed=failed,
+        threshold=threshold,
+        confidence=confidence,
+        aggressive_share=share(lambda score: score >= threshold),
+        mean=stratified_estimate(
+            sizes,
+            {name: [float(v) for v in vals] for name, vals in scores.items()},
+            confidence,
+            (0.0, 9.0),
+        ),
+        distribution={k: share(lambda score, k=k: score == k) for k in range(10)},
+        strata={name: (size, len(scores[name])) for name, size in sizes.items()},
+    )
+
+
+async def sample_estimate(
+    texts: Sequence[str],
+    *,
+    size: int = 400,
+    strategy: str = "length",
+    threshold: int = 6,
+    confidence: float = 0.95,
+    target_margin: float | None = None,
+    step: int | None = None,
+    max_rows: int | None = None,
+    seed: int | None = None,
+    concurrency: int | None = None,
+    store: ResultStore | None = None,
+) -> SampleReport:
+    """Score a stratified random sample of ``texts`` and estimate the results.
+
+    Parameters
+    ----------
+    texts:
+        Full population of texts.
+    size:
+        Rows scored in the first round.
+    strategy:
+        ``"length"`` or ``"moderation"``; see :func:`length_strata` and
+        :func:`moderation_strata`.
+    threshold:
+        ``aggressiveness_overall`` at or above which a row counts as
+        aggressive.
+    confidence:
+        Confidence level of the intervals.
+    target_margin:
+        Keep sampling until the interval half-width of the aggressive share
+        is at most this value. ``None`` stops after the first round.
+    step:
+        Extra rows drawn per additional round; defaults to ``size``.
+    max_rows:
+        Upper bound on sampled rows; defaults to the whole population.
+    seed:
+        Seed for reproducible draws.
+    concurrency, store:
+        Passed to :func:`kougeki.engine.analyze`.
+
+    Raises :class:`ValueError` for an unknown ``strategy`` or when ``size``,
+    ``step`` or ``max_rows`` is not positive.
+    """
+
+    if strategy not in STRATEGIES:
+        raise ValueError(f"unknown sampling strategy: {strategy}")
+    for name, value in (("size", size), ("step", step), ("max_rows", max_rows)):
+        if value is not None and value < 1:
+            raise ValueError(f"{name} must be positive, got {value}")
+    texts = list(texts)
+    if strategy == "length":
+        labels, order = length_strata(texts), _length_labels()
+    else:
+        labels, order = await moderation_strata(texts, concurrency), _moderation_labels()
+
+    groups: dict[str, list[int]] = {}
+    for idx, label in enumerate(labels):
+        groups.setdefault(label, []).append(idx)
+    rng = random.Random(seed)
+    for rows in groups.values():
+        rng.shuffle(rows)
+    sizes = {name: len(groups[name]) for name in order if name in groups}
+
+    limit = min(max_rows or len(texts), len(texts))
+    goal = min(size, limit)
+    taken = {name: 0 for name in sizes}
+    scores: dict[str, list[int]] = {name: [] for name in sizes}
+    failed = 0
+    while True:
+        target = allocate(sizes, goal)
+        draw = [
+            (name, idx)
+            for name in sizes
+            for idx in groups[name][taken[name] : target[name]]
+        ]
+        if draw:
+            results = await engine.analyze(
+                [texts[idx] for _, idx in draw],
+                concurrency=concurrency,
+                store=store,
+            )
+            for (name, _), res in zip(draw, results):
+                if res.overall is None:
+                    failed += 1
+                else:
+                    scores[name].append(res.overall)
+            for name in sizes:
+                taken[name] = max(taken[name], target[name])
+        report = _report(sizes, scores, failed, threshold, confidence)
+        margin = report.aggressive_share.margin
+        logger.info(
+            "sampled %s of %s rows; aggressive share %.3f ± %.3f",
+            sum(taken.values()),
+            len(texts),
+            report.aggressive_share.value,
+            margin,
+        )
+        if target_margin is None or margin <= target_margin:
+            return report
+        if goal >= limit:
+            logger.warning(
+                "target margin %.3f not reached; stopped at %.3f", target_margin, margin
+            )
+            return report
+        goal = min(goal + (step or size), limit)
@@ -0,0 +1,234 @@
+"""Local HTTP service exposing aggressiveness scoring to other tools.
+
+Endpoints
+---------
+``POST /score``
+    Body ``{"text": "..."}``; returns the output columns for one post.
+``POST /score/batch``
+    Body ``{"texts": ["...", ...]}``; returns ``{"results": [...]}`` in
+    input order.
+``GET /health``
+    Liveness probe.
+
+Requests go through :mod:`kougeki.engine`, so the configured concurrency
+and rate limiter apply. Identical texts requested concurrently share a
+single upstream analysis and recent results are kept in an LRU cache.
+"""
+
+import asyncio
+import json
+import logging
+import statistics
+import time
+from collections import OrderedDict, deque
+
+from . import engine
+from .config import settings
+from .models import RowResult
+
+logger = logging.getLogger(__name__)
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    502: "Bad Gateway",
+}
+
+
+class LatencyMonitor:
+    """Track request latency against the configured SLO."""
+
+    def __init__(self, slo_ms: float, window: int = 1000, report_every: int = 100):
+        self.slo_ms = slo_ms
+        self.samples: deque[float] = deque(maxlen=window)
+        self.report_every = report_every
+        self.count = 0
+
+    def record(self, label: str, elapsed_ms: float) -> None:
+        self.samples.append(elapsed_ms)
+        self.count += 1
+        if elapsed_ms > self.slo_ms:
+            logger.warning(
+                "%s took %.0f ms (SLO %.0f ms)", label, elapsed_ms, self.slo_ms
+            )
+        if self.count % self.report_every == 0:
+            logger.info("latency %s", self.summary())
+
+    def summary(self) -> dict[str, float]:
+        if len(self.samples) < 2:
+            return {}
+        cuts = statistics.quantiles(self.samples, n=100)
+        within = sum(1 for sample in self.samples if sample <= self.slo_ms)
+        return {
+            "p50_ms": round(cuts[49], 1),
+            "p95_ms": round(cuts[94], 1),
+            "p99_ms": round(cuts[98], 1),
+            "slo_attainment": round(within / len(self.samples), 4),
+        }
+
+
+class ScoringService:
+    """Score texts with request coalescing and an LRU result cache."""
+
+    def __init__(self, cache_size: int | None = None, slo_ms: float | None = None):
+        self.cache_size = (
+            settings.server_cache_size if cache_size is None else cache_size
+        )
+        self.latency = LatencyMonitor(
+            settings.server_slo_ms if slo_ms is None else slo_ms
+        )
+        self._cache: OrderedDict[str, RowResult] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future[RowResult]] = {}
+
+    async def score(self, text: str) -> RowResult:
+        """Return the analysis of ``text``, sharing identical in-flight work."""
+        return (await self.score_many([text]))[0]
+
+    async def score_many(self, texts: list[str]) -> list[RowResult]:
+        """Analyze ``texts`` in one engine pass, skipping cached and in-flight ones."""
+        loop = asyncio.get_running_loop()
+        lookup: dict[str, asyncio.Future[RowResult]] = {}
+        fresh: list[str] = []
+        for text in dict.fromkeys(texts):
+            cached = self._cache.get(text)
+            if cached is not None:
+                self._cache.move_to_end(text)
+                lookup[text] = loop.create_future()
+                lookup[text].set_result(cached)
+            elif text in self._inflight:
+                lookup[text] = self._inflight[text]
+            else:
+                lookup[text] = self._inflight[text] = loop.create_future()
+                fresh.append(text)
+
+        if fresh:
+            try:
+                results = await engine.analyze_texts(fresh)
+            except Exception as exc:  # noqa: BLE001
+                for text in fresh:
+                    lookup[text].set_exception(exc)
+                    # Mark as retrieved so unawaited failures do not warn.
+                    lookup[text].exception()
+                raise
+            else:
+                for text, result in zip(fresh, results):
+                    lookup[text].set_result(result)
+                    self._remember(text, result)
+            finally:
+                for text in fresh:
+                    del self._inflight[text]
+                    if not lookup[text].done():
+                        # This request was cancelled before the analysis
+                        # finished; waiters sharing it retry on their own.
+                        lookup[text].cancel()
+
+        unique = list(dict.fromkeys(texts))
+        resolved = await asyncio.gather(
+            *(asyncio.shield(lookup[text]) for text in unique),
+            return_exceptions=True,
+        )
+        by_text: dict[str, RowResult] = {}
+        orphaned: list[str] = []
+        for text, result in zip(unique, resolved):
+            if isinstance(result, asyncio.CancelledError) and lookup[text].cancelled():
+                orphaned.append(text)
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                by_text[text] = result
+        if orphaned:
+            by_text.update(zip(orphaned, await self.score_many(orphaned)))
+        return [by_text[text] for text in texts]
+
+    def _remember(self, text: str, result: RowResult) -> None:
+        if self.cache_size <= 0 or result.error is not None or result.llm_pending:
+            return
+        self._cache[text] = result
+        self._cache.move_to_end(text)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> tuple[int, dict]:
+        """Route one request and return ``(status, payload)``."""
+        if path == "/health":
+            return 200, {"status": "ok", "latency": self.latency.summary()}
+        if path not in ("/score", "/score/batch"):
+            return 404, {"error": f"unknown path {path}"}
+        if method != "POST":
+            return 405, {"error": "use POST"}
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            return 400, {"error": "body must be JSON"}
+        if not isinstance(payload, dict):
+            return 400, {"error": "body must be a JSON object"}
+
+        started = time.perf_counter()
+        try:
+            if path == "/score":
+                text = payload.get("text")
+                if not isinstance(text, str):
+                    return 400, {"error": "'text' must be a string"}
+                response = engine.result_record(await self.score(text))
+            else:
+                texts = payload.get("texts")
+                if not isinstance(texts, list) or not all(
+                    isinstance(text, str) for text in texts
+                ):
+                    return 400, {"error": "'texts' must be a list of strings"}
+                results = await self.score_many(texts)
+                response = {"results": [engine.result_record(res) for res in results]}
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("scoring request failed")
+            return 502, {"error": str(exc)}
+        finally:
+            self.latency.record(path, (time.perf_counter() - started) * 1000)
+        return 200, response
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            request_line = await reader.readline()
+            method, path, _ = request_line.decode("latin-1").split(" ", 2)
+            headers: dict[str, str] = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = line.decode("latin-1").partition(":")
+                headers[key.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", 0))
+            body = await reader.readexactly(length) if length else b""
+            status, payload = await self.dispatch(method, path.split("?", 1)[0], body)
+        except (ValueError, asyncio.IncompleteReadError):
+            status, payload = 400, {"error": "malformed request"}
+
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + data)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+
+async def serve(host: str | None = None, port: int | None = None) -> None:
+    """Serve the scoring API until cancelled."""
+    service = ScoringService()
+    server = await asyncio.start_server(
+        service.handle_connection,
+        host or settings.server_host,
+        port or settings.server_port,
+    )
+    for sock in server.sockets:
+        logger.info("scoring service listening on %s", sock.getsockname())
+    async with server:
+        await server.serve_forever()
@@ -1,14 +1,14 @@
 """Async service layer for calling the OpenAI API."""
 
 import asyncio
-import json
+import atexit
+import hashlib
 import logging
 from functools import wraps
 from collections.abc import Awaitable, Callable
-from typing import ParamSpec, TypeVar
-
-from openai import AsyncOpenAI
+from typing import TYPE_CHECKING, ParamSpec, TypeVar
 
+from .circuit import CircuitBreaker, CircuitOpenError
 from .config import settings
 from .models import (
     AggressivenessResult,
@@ -16,10 +16,75 @@ from .models import (
     ModerationResult,
     ModerationScores,
 )
+from .hedging import HedgingPolicy
+from .parsing import parse_aggressiveness
+from .ratelimit import RateLimiter
+from .transport import RecordingClient, ReplayClient
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
 
 logger = logging.getLogger(__name__)
 
-client = AsyncOpenAI(api_key=settings.openai_api_key)
+#: Limiter awaited before every API request. ``None`` disables pacing.
+#: Worker processes replace it with a shared limiter.
+rate_limiter: RateLimiter | None = (
+    RateLimiter(settings.requests_per_second)
+    if settings.requests_per_second > 0
+    else None
+)
+
+#: One breaker per endpoint; an open breaker makes calls fail fast.
+breakers: dict[str, CircuitBreaker] = {
+    endpoint: CircuitBreaker(
+        endpoint,
+        failure_rate=settings.breaker_failure_rate,
+        min_calls=settings.breaker_min_calls,
+        window=settings.breaker_window,
+        open_seconds=settings.breaker_open_seconds,
+    )
+    for endpoint in ("moderation", "chat")
+}
+
+#: Per-model hedging state for chat requests, see :func:`hedging_policy`.
+hedging_policies: dict[str, HedgingPolicy] = {}
+
+
+def get_client() -> "AsyncOpenAI":
+    """Return the shared OpenAI client, creating it on first use.
+
+    Importing :mod:`openai` and building the client is deferred until the
+    first request so that the GUI and CLI start quickly. Assigning
+    ``services.client`` replaces the shared client. With ``CASSETTE_MODE``
+    set to ``record`` or ``replay`` the client is wrapped or replaced by the
+    transports in :mod:`kougeki.transport`.
+    """
+    client = globals().get("client")
+    if client is None:
+        client = globals()["client"] = _build_client()
+    return client
+
+
+def _build_client():
+    mode = settings.cassette_mode.lower()
+    if mode == "replay":
+        logger.info("replaying API traffic from %s", settings.cassette_path)
+        return ReplayClient(settings.cassette_path, speed=settings.replay_speed)
+
+    from openai import AsyncOpenAI
+
+    client = AsyncOpenAI(api_key=settings.openai_api_key)
+    if mode == "record":
+        logger.info("recording API traffic to %s", settings.cassette_path)
+        client = RecordingClient(client, settings.cassette_path)
+        atexit.register(client.close)
+    return client
+
+
+def __getattr__(name: str):
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 P = ParamSpec("P")
@@ -50,6 +115,8 @@ def retry(max_attempts: int = 5, base_delay: float = 1.0) -> Callable[[Callable[
             for attempt in range(max_attempts):
                 try:
                     return await func(*args, **kwargs)
+                except CircuitOpenError:
+                    raise
                 except Exception:  # noqa: BLE001
                     logger.exception(
                         "%s failed (attempt %s)", func.__name__, attempt + 1
@@ -64,10 +131,43 @@ def retry(max_attempts: int = 5, base_delay: float = 1.0) -> Callable[[Callable[
     return decorator
 
 
-@retry()
-async def moderate_text(text: str) -> ModerationResult:
-    resp = await client.moderations.create(input=text, model=settings.moderation_model)
-    result = resp.results[0]
+def hedging_policy(model: str) -> HedgingPolicy:
+    """Return the hedging policy tracking latencies of ``model``."""
+    policy = hedging_policies.get(model)
+    if policy is None:
+        policy = hedging_policies[model] = HedgingPolicy(
+            budget=settings.hedge_budget,
+            quantile=settings.hedge_quantile,
+            min_samples=settings.hedge_min_samples,
+        )
+    return policy
+
+
+async def _guarded(endpoint: str, call: Callable[[], Awaitable[T]]) -> T:
+    """Run ``call`` through the circuit breaker of ``endpoint``.
+
+    A cancelled call records no outcome but frees its half-open probe slot.
+    """
+    breaker = breakers[endpoint]
+    breaker.before_call()
+    try:
+        result = await call()
+    except asyncio.CancelledError:
+        breaker.release_probe()
+        raise
+    except Exception:  # noqa: BLE001
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    return result
+
+
+async def _throttle() -> None:
+    if rate_limiter is not None:
+        await rate_limiter.acquire()
+
+
+def _to_moderation_result(result) -> ModerationResult:
     categories = ModerationCategories(
         hate=result.categories.hate,
         hate_threatening=result.categories.hate_threatening,
@@ -89,6 +189,35 @@ async def moderate_text(text: str) -> ModerationResult:
     return ModerationResult(categories=categories, scores=scores)
 
 
+@retry()
+async def moderate_text(text: str) -> ModerationResult:
+    await _throttle()
+    resp = await _guarded(
+        "moderation",
+        lambda: get_client().moderations.create(input=text, model=settings.moderation_model),
+    )
+    return _to_moderation_result(resp.results[0])
+
+
+@retry()
+async def moderate_texts(texts: list[str]) -> list[ModerationResult]:
+    """Moderate several texts with a single API request."""
+    await _throttle()
+    resp = await _guarded(
+        "moderation",
+        lambda: get_client().moderations.create(
+            input=list(texts), model=settings.moderation_model
+        ),
+    )
+    if len(resp.results) != len(texts):
+        raise ValueError(
+            f"moderation returned {len(resp.results)} results for {len(texts)} inputs"
+        )
+    return [_to_moderation_result(result) for result in resp.results]
+
+
+SYSTEM_PROMPT = "You are a helpful assistant that analyzes text for aggressiveness."
+
 #: Few-shot examples for better boundary prediction as suggested in AGENT.md
 FEW_SHOT_EXAMPLES = """{
   "examples": [
@@ -124,38 +253,81 @@ AGGRESSIVE_PROMPT = """あなたはソーシャルメディアの投稿を分析
 {examples}
 """
 
+#: Identifies the prompt wording so stored results can be matched to it.
+PROMPT_VERSION = hashlib.sha256(
+    (AGGRESSIVE_PROMPT + FEW_SHOT_EXAMPLES).encode("utf-8")
+).hexdigest()[:12]
+
 
 @retry()
-async def get_aggressiveness_score(text: str) -> AggressivenessResult:
+async def get_aggressiveness_score(
+    text: str, model: str | None = None
+) -> AggressivenessResult:
+    """Score ``text`` with ``model`` (default :attr:`Settings.chat_model`)."""
+    model = model or settings.chat_model
     prompt = AGGRESSIVE_PROMPT.format(text=text, examples=FEW_SHOT_EXAMPLES)
-    resp = await client.chat.completions.create(
-        model=settings.chat_model,
-        messages=[
-            {
-                "role": "system",
-                "content": "You are a helpful assistant that analyzes text for aggressiveness.",
-            },
-            {"role": "user", "content": prompt},
-        ],
-        temperature=settings.chat_temperature,
-        top_p=0.9,
-        response_format={"type": "json_object"},
+
+    async def create():
+        return await get_client().chat.completions.create(
+            model=model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": SYSTEM_PROMPT,
+                },
+                {"role": "user", "content": prompt},
+            ],
+            temperature=settings.chat_temperature,
+            top_p=0.9,
+            response_format={"type": "json_object"},
+        )
+
+    if settings.hedge_enabled:
+        resp = await _guarded(
+            "chat", lambda: hedging_policy(model).run(create, throttle=_throttle)
+        )
+    else:
+        await _throttle()
+        resp = await _guarded("chat", create)
+    score, reason = parse_aggressiveness(resp.choices[0].message.content)
+    return AggressivenessResult(score=score, reason=reason, model=model)
+
+
+#: Reason recorded for rows whose score was derived from moderation alone.
+DERIVED_REASON = "モデレーションスコアから推定（LLM未使用）"
+
+
+def moderation_signal(mod_scores: ModerationScores) -> float:
+    """Return the strongest hostility-related moderation score (0-1)."""
+    return max(
+        mod_scores.hate,
+        mod_scores.hate_threatening,
+        mod_scores.violence,
+        mod_scores.violence_graphic,
+    )
+
+
+def derive_aggressiveness(mod_scores: ModerationScores) -> AggressivenessResult:
+    """Estimate an aggressiveness score from moderation scores only.
+
+    Used by the cascade mode for rows whose moderation result is clear
+    enough that the chat model is not consulted.
+    """
+
+    score = max(0, min(9, round(moderation_signal(mod_scores) * 9)))
+    return AggressivenessResult(
+        score=score,
+        reason=DERIVED_REASON,
+        model=settings.moderation_model,
+        source="moderation",
     )
-    try:
-        data = json.loads(resp.choices[0].message.content)
-        score = data.get("score")
-        reason = data.get("reason")
-    except Exception:  # noqa: BLE001
-        logger.exception("failed to parse aggressiveness JSON")
-        score = None
-        reason = None
-    return AggressivenessResult(score=score, reason=reason)
 
 
 def aggregate_aggressiveness(
     mod_scores: ModerationScores,
     llm_score: int | None,
     weights: dict[str, float] | None = None,
+    derived: bool = False,
 ) -> int | None:
     """Combine LLM and moderation scores into a single metric.
 
@@ -169,6 +341,10 @@ def aggregate_aggressiveness(
     weights:
         Mapping of ``"llm"``, ``"hate"`` and ``"violence"`` weight values.
         If ``None`` the values from :data:`kougeki.config.settings` are used.
+    derived:
+        ``True`` when ``llm_score`` was produced by
+        :func:`derive_aggressiveness`. It already reflects the moderation
+        scores, so it is returned as is instead of being weighted again.
 
     Returns
     -------
@@ -180,6 +356,9 @@ def aggregate_aggressiveness(
     if llm_score is None:
         return None
 
+    if derived:
+        return max(0, min(9, round(llm_score)))
+
     if weights is None:
         weights = {
             "llm": settings.llm_weight,
@@ -0,0 +1,203 @@
+"""Multi-process execution for inputs too large for a single interpreter.
+
+The input is split into contiguous row ranges, each processed by
+:func:`kougeki.engine.analyze_texts` in its own process with its own event
+loop and OpenAI client. All shards draw from one requests-per-second budget
+held in shared memory, and results are merged back in input order. Worker
+log records are relayed to the parent's handlers.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+from collections.abc import Callable, Sequence
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from . import engine, logging_config, parsing, services
+from .config import settings
+from .models import RowResult
+from .ratelimit import SharedRateLimiter
+
+logger = logging.getLogger(__name__)
+
+#: Seconds between progress updates while shards are running.
+PROGRESS_INTERVAL = 0.5
+
+#: Rows finished by all workers, shared with the parent.
+_rows_done = None
+
+
+def split_ranges(total: int, shards: int) -> list[tuple[int, int]]:
+    """Split ``range(total)`` into at most ``shards`` contiguous ranges."""
+    shards = max(1, min(shards, total))
+    size, remainder = divmod(total, shards)
+    ranges = []
+    start = 0
+    for shard in range(shards):
+        stop = start + size + (1 if shard < remainder else 0)
+        if stop > start:
+            ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def _init_worker(
+    requests_per_second: float, next_slot, rows_done, log_queue, log_level: int
+) -> None:
+    # Spawned workers start without a client; services.get_client() builds
+    # one per process on the first request.
+    global _rows_done
+    _rows_done = rows_done
+    logging_config.setup_worker_logging(log_queue, log_level)
+    services.rate_limiter = (
+        SharedRateLimiter(requests_per_second, next_slot)
+        if requests_per_second > 0
+        else None
+    )
+
+
+def _row_finished(_completed: int, _total: int) -> None:
+    if _rows_done is not None:
+        with _rows_done.get_lock():
+            _rows_done.value += 1
+
+
+def _counters() -> dict:
+    return {
+        "hedging": {
+            model: policy.stats() for model, policy in services.hedging_policies.items()
+        },
+        "parse": parsing.parse_stats.as_dict(),
+    }
+
+
+def _run_shard(
+    start: int, texts: list[str], concurrency: int, row_ids: list[int]
+) -> tuple[int, list[RowResult], dict]:
+    # Workers may run several shards, so report only this shard's counts.
+    before = _counters()
+    results = asyncio.run(
+        engine.analyze_texts(
+            texts, concurrency, on_progress=_row_finished, row_ids=row_ids
+        )
+    )
+    after = _counters()
+    hedging = {}
+    for model, stats in after["hedging"].items():
+        prior = before["hedging"].get(model, {})
+        hedging[model] = {
+            key: stats[key] - prior.get(key, 0)
+            for key in ("requests", "hedges", "hedge_wins")
+        }
+    parse = {key: after["parse"][key] - before["parse"][key] for key in after["parse"]}
+    return start, results, {"hedging": hedging, "parse": parse}
+
+
+def _merge_counters(counters: dict) -> None:
+    """Add a shard's hedging and parse counts to this process's totals."""
+    for model, stats in counters["hedging"].items():
+        services.hedging_policy(model).add_counts(stats)
+    parsing.parse_stats.add(counters["parse"])
+
+
+def analyze_sharded(
+    texts: Sequence[str],
+    shards: int | None = None,
+    requests_per_second: float | None = None,
+    concurrency: int | None = None,
+    on_progress: Callable[[int, int], None] | None = None,
+    row_ids: Sequence[int] | None = None,
+) -> list[RowResult]:
+    """Analyze ``texts`` across a process pool and return results in order.
+
+    Parameters
+    ----------
+    texts:
+        Texts to analyze.
+    shards:
+        Number of worker processes. Defaults to
+        :attr:`kougeki.config.Settings.shard_count`.
+    requests_per_second:
+        Budget shared by all shards; ``0`` disables pacing. Defaults to
+        :attr:`kougeki.config.Settings.requests_per_second`.
+    concurrency:
+        Rows in flight per shard. Defaults to
+        :attr:`kougeki.config.Settings.concurrency`.
+    on_progress:
+        Called with ``(completed, total)`` as rows finish in the workers, at
+        most every :data:`PROGRESS_INTERVAL` seconds.
+    row_ids:
+        Row number of each text in the caller's input, used in log records.
+        Defaults to the position in ``texts``.
+
+    Hedging and answer-parsing counts from the workers are added to
+    :data:`kougeki.services.hedging_policies` and
+    :data:`kougeki.parsing.parse_stats` of this process, so the totals
+    logged by :func:`kougeki.engine.analyze` cover every shard.
+    """
+
+    shards = shards or settings.shard_count
+    if requests_per_second is None:
+        requests_per_second = settings.requests_per_second
+    concurrency = concurrency or settings.concurrency
+    texts = list(texts)
+    total = len(texts)
+    ranges = split_ranges(total, shards)
+    if not ranges:
+        return []
+
+    row_ids = list(range(total) if row_ids is None else row_ids)
+
+    ctx = multiprocessing.get_context("spawn")
+    next_slot = ctx.Value("d", 0.0)
+    rows_done = ctx.Value("q", 0)
+    log_queue = ctx.Queue()
+    merged: dict[int, list[RowResult]] = {}
+    reported = 0
+    relay = logging_config.relay_worker_logs(log_queue)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=len(ranges),
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(
+                requests_per_second,
+                next_slot,
+                rows_done,
+                log_queue,
+                logging.getLogger().getEffectiveLevel(),
+            ),
+        ) as pool:
+            pending = {
+                pool.submit(
+                    _run_shard,
+                    start,
+                    texts[start:stop],
+                    concurrency,
+                    row_ids[start:stop],
+                )
+                for start, stop in ranges
+            }
+            while pending:
+                done, pending = wait(
+                    pending, timeout=PROGRESS_INTERVAL, return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    start, results, counters = future.result()
+                    merged[start] = results
+                    _merge_counters(counters)
+                    logger.info(
+                        "shard at row %s finished (%s rows, answers parsed: %s)",
+                        start,
+                        len(results),
+                        counters["parse"],
+                    )
+                completed = rows_done.value
+                if on_progress is not None and completed != reported:
+                    reported = completed
+                    on_progress(completed, total)
+    finally:
+        # Workers have exited, so everything they logged is in the queue.
+        relay.stop()
+
+    return [res for start in sorted(merged) for res in merged[start]]
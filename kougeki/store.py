@@ -0,0 +1,228 @@
+"""SQLite history of every scored post.
+
+The store keeps one row per analysis with the text hash, all moderation
+flags and scores, the LLM score and reason, and the model and prompt
+version that produced them. It is used as a warm cache for repeated texts
+and as an export source for recalibration.
+"""
+
+import csv
+import hashlib
+import sqlite3
+import time
+from collections.abc import Iterable, Sequence
+
+from .config import settings
+from .constants import CATEGORY_NAMES
+from .models import (
+    AggressivenessResult,
+    ModerationCategories,
+    ModerationResult,
+    ModerationScores,
+    RowResult,
+)
+
+_CATEGORY_ATTRS = [name.replace("/", "_").replace("-", "_") for name in CATEGORY_NAMES]
+
+_COLUMNS = (
+    ["text_hash", "text", "model", "prompt_version", "created_at"]
+    + [f"{attr}_flag" for attr in _CATEGORY_ATTRS]
+    + [f"{attr}_score" for attr in _CATEGORY_ATTRS]
+    + ["aggressiveness_score", "aggressiveness_reason", "aggressiveness_overall"]
+    + ["aggressiveness_source", "input_truncated", "max_input_tokens"]
+)
+
+#: Columns added after the first release, created on older databases.
+_ADDED_COLUMNS = {
+    "aggressiveness_source": "aggressiveness_source TEXT NOT NULL DEFAULT 'llm'",
+    "input_truncated": "input_truncated INTEGER NOT NULL DEFAULT 0",
+    # Truncation limit the row was scored under; unknown (NULL) for rows
+    # stored before it was recorded, which are never reused.
+    "max_input_tokens": "max_input_tokens INTEGER",
+}
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    text_hash TEXT NOT NULL,
+    text TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    {", ".join(f"{attr}_flag INTEGER NOT NULL" for attr in _CATEGORY_ATTRS)},
+    {", ".join(f"{attr}_score REAL NOT NULL" for attr in _CATEGORY_ATTRS)},
+    aggressiveness_score INTEGER,
+    aggressiveness_reason TEXT,
+    aggressiveness_overall INTEGER,
+    {", ".join(_ADDED_COLUMNS.values())}
+);
+CREATE INDEX IF NOT EXISTS idx_results_lookup
+    ON results (text_hash, model, prompt_version, created_at);
+CREATE INDEX IF NOT EXISTS idx_results_created_at ON results (created_at);
+"""
+
+
+def text_hash(text: str) -> str:
+    """Return the key used to look up ``text`` in the store."""
+    return hashlib.sha256(str(text).encode("utf-8")).hexdigest()
+
+
+class ResultStore:
+    """Append-only SQLite store of analysis results."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        existing = {row["name"] for row in self.conn.execute("PRAGMA table_info(results)")}
+        with self.conn:
+            for column, definition in _ADDED_COLUMNS.items():
+                if column not in existing:
+                    self.conn.execute(f"ALTER TABLE results ADD COLUMN {definition}")
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def add_many(
+        self,
+        texts: Sequence[str],
+        results: Sequence[RowResult],
+        model: str,
+        prompt_version: str,
+        max_input_tokens: int | None = None,
+    ) -> None:
+        """Insert ``results`` for ``texts`` in a single transaction.
+
+        ``model`` is recorded for results that do not name the model that
+        produced them, and ``max_input_tokens`` as the truncation limit
+        they were scored under.
+        """
+        now = time.time()
+        rows = []
+        for text, res in zip(texts, results):
+            rows.append(
+                [
+                    text_hash(text),
+                    str(text),
+                    res.aggressiveness.model or model,
+                    prompt_version,
+                    now,
+                ]
+                + [int(getattr(res.moderation.categories, a)) for a in _CATEGORY_ATTRS]
+                + [getattr(res.moderation.scores, a) for a in _CATEGORY_ATTRS]
+                + [
+                    res.aggressiveness.score,
+                    res.aggressiveness.reason,
+                    res.overall,
+                    res.aggressiveness.source,
+                    int(res.truncated),
+                    max_input_tokens,
+                ]
+            )
+        placeholders = ", ".join("?" for _ in _COLUMNS)
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT INTO results ({', '.join(_COLUMNS)}) VALUES ({placeholders})",
+                rows,
+            )
+
+    def lookup(
+        self,
+        texts: Iterable[str],
+        models: Sequence[str],
+        prompt_version: str,
+        max_input_tokens: int | None = None,
+    ) -> dict[str, RowResult]:
+        """Return the latest stored result per text hash for ``texts``.
+
+        Only results produced by one of ``models`` with ``prompt_version``
+        that have an LLM score are returned, so stale or failed rows are
+        re-analyzed. When ``max_input_tokens`` is given, results scored
+        under a different truncation limit are skipped as well.
+        """
+        hashes = list({text_hash(text) for text in texts})
+        found: dict[str, RowResult] = {}
+        limit_clause, limit_params = "", []
+        if max_input_tokens is not None:
+            limit_clause, limit_params = "AND max_input_tokens = ?", [max_input_tokens]
+        # Stay below SQLite's default bound-parameter limit.
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start : start + 500]
+            cursor = self.conn.execute(
+                f"""SELECT * FROM results
+                WHERE text_hash IN ({", ".join("?" for _ in chunk)})
+                  AND model IN ({", ".join("?" for _ in models)})
+                  AND prompt_version = ?
+                  AND aggressiveness_score IS NOT NULL
+                  {limit_clause}
+                ORDER BY created_at""",
+                [*chunk, *models, prompt_version, *limit_params],
+            )
+            for row in cursor:
+                found[row["text_hash"]] = _row_to_result(row)
+        return found
+
+    def history(
+        self,
+        text: str | None = None,
+        digest: str | None = None,
+        limit: int = 50,
+    ) -> list[dict]:
+        """Return stored rows, newest first, optionally filtered by text."""
+        if text is not None:
+            digest = text_hash(text)
+        if digest is not None:
+            cursor = self.conn.execute(
+                "SELECT * FROM results WHERE text_hash = ? "
+                "ORDER BY created_at DESC LIMIT ?",
+                (digest, limit),
+            )
+        else:
+            cursor = self.conn.execute(
+                "SELECT * FROM results ORDER BY created_at DESC LIMIT ?", (limit,)
+            )
+        return [dict(row) for row in cursor]
+
+    def export_csv(self, path: str, since: float | None = None) -> int:
+        """Write stored rows to ``path`` and return the number written."""
+        cursor = self.conn.execute(
+            "SELECT * FROM results WHERE created_at >= ? ORDER BY id",
+            (since or 0.0,),
+        )
+        count = 0
+        with open(path, "w", newline="", encoding="utf-8-sig") as fh:
+            writer = csv.writer(fh)
+            writer.writerow(["id", *_COLUMNS])
+            for row in cursor:
+                writer.writerow([row["id"], *(row[col] for col in _COLUMNS)])
+                count += 1
+        return count
+
+
+def _row_to_result(row: sqlite3.Row) -> RowResult:
+    return RowResult(
+        moderation=ModerationResult(
+            categories=ModerationCategories(
+                **{a: bool(row[f"{a}_flag"]) for a in _CATEGORY_ATTRS}
+            ),
+            scores=ModerationScores(**{a: row[f"{a}_score"] for a in _CATEGORY_ATTRS}),
+        ),
+        aggressiveness=AggressivenessResult(
+            score=row["aggressiveness_score"],
+            reason=row["aggressiveness_reason"],
+            model=row["model"],
+            source=row["aggressiveness_source"],
+        ),
+        overall=row["aggressiveness_overall"],
+        truncated=bool(row["input_truncated"]),
+    )
+
+
+def open_store() -> ResultStore | None:
+    """Open the store configured by ``RESULTS_DB`` or return ``None``."""
+    if not settings.results_db:
+        return None
+    return ResultStore(settings.results_db)
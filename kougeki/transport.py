@@ -0,0 +1,212 @@
+"""Record/replay transport for deterministic offline runs.
+
+:class:`RecordingClient` wraps the OpenAI client and appends every
+moderation and chat request, its response or error, and its latency to a
+gzip-compressed JSON lines cassette. :class:`ReplayClient` serves those
+responses back without the network, sleeping for the recorded latency
+(scaled by ``speed``) and re-raising recorded errors such as 429s, so
+concurrency and caching changes can be benchmarked against real traffic.
+
+Every entry is flushed as it is written, so a recording process that is
+killed leaves a readable cassette: :func:`read_cassette` accepts a gzip
+member without its end marker, and :class:`RecordingClient` completes such
+a member before appending. Recording runs in a single process;
+:func:`kougeki.engine.analyze` does not shard while recording.
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+import zlib
+from collections import defaultdict, deque
+from types import SimpleNamespace
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayedAPIError(RuntimeError):
+    """Error raised during replay in place of a recorded API error."""
+
+    def __init__(self, message: str, status_code: int | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CassetteMissError(LookupError):
+    """Raised when a request was never recorded."""
+
+
+def request_key(endpoint: str, kwargs: dict) -> str:
+    """Return the key identifying a request in a cassette."""
+    return endpoint + ":" + json.dumps(kwargs, sort_keys=True, ensure_ascii=False)
+
+
+def _decompress(data: bytes) -> tuple[bytes, bool]:
+    """Decompress concatenated gzip members.
+
+    Returns the decompressed bytes and whether the last member was
+    incomplete, as left behind by a process that was killed while
+    recording. Whatever was flushed before that is kept.
+    """
+    out = []
+    while data:
+        decoder = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        try:
+            out.append(decoder.decompress(data))
+        except zlib.error:
+            return b"".join(out), True
+        if not decoder.eof:
+            return b"".join(out), True
+        data = decoder.unused_data
+    return b"".join(out), False
+
+
+def read_cassette(path: str) -> list[dict]:
+    """Return the entries of the cassette at ``path``.
+
+    A truncated final member and a partially written last line are skipped
+    with a warning instead of failing the whole cassette.
+    """
+    with open(path, "rb") as fh:
+        data, truncated = _decompress(fh.read())
+    entries = []
+    for line in data.decode("utf-8", errors="replace").splitlines():
+        if not line.strip():
+            continue
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            truncated = True
+    if truncated:
+        logger.warning(
+            "cassette %s was not closed cleanly; loaded %s entries", path, len(entries)
+        )
+    return entries
+
+
+def _repair(path: str) -> None:
+    """Rewrite a cassette whose last member is incomplete as complete members."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as fh:
+        data, truncated = _decompress(fh.read())
+    if not truncated:
+        return
+    lines = data.decode("utf-8", errors="replace").splitlines(keepends=True)
+    if lines and not lines[-1].endswith("\n"):
+        lines.pop()
+    tmp = path + ".tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8") as fh:
+        fh.writelines(lines)
+    os.replace(tmp, path)
+    logger.warning("completed truncated cassette %s before appending", path)
+
+
+def _dump(response) -> object:
+    if hasattr(response, "model_dump"):
+        return response.model_dump()
+    return json.loads(json.dumps(response, default=lambda obj: vars(obj)))
+
+
+def _namespace(data: object) -> object:
+    if isinstance(data, dict):
+        return SimpleNamespace(**{key: _namespace(value) for key, value in data.items()})
+    if isinstance(data, list):
+        return [_namespace(value) for value in data]
+    return data
+
+
+class _Endpoint:
+    def __init__(self, owner, endpoint: str, create):
+        self._owner = owner
+        self._endpoint = endpoint
+        self._create = create
+
+    async def create(self, **kwargs):
+        return await self._owner._call(self._endpoint, self._create, kwargs)
+
+
+class RecordingClient:
+    """Proxy for ``AsyncOpenAI`` that records calls to ``path``."""
+
+    def __init__(self, inner, path: str):
+        self._inner = inner
+        _repair(path)
+        self._file = gzip.open(path, "at", encoding="utf-8")
+        self._started = time.perf_counter()
+        self.moderations = _Endpoint(self, "moderations", inner.moderations.create)
+        self.chat = SimpleNamespace(
+            completions=_Endpoint(self, "chat", inner.chat.completions.create)
+        )
+
+    async def _call(self, endpoint: str, create, kwargs: dict):
+        started = time.perf_counter()
+        entry = {
+            "endpoint": endpoint,
+            "request": kwargs,
+            "offset": started - self._started,
+        }
+        try:
+            response = await create(**kwargs)
+        except Exception as exc:
+            entry["error"] = {
+                "type": type(exc).__name__,
+                "message": str(exc),
+                "status_code": getattr(exc, "status_code", None),
+            }
+            raise
+        else:
+            entry["response"] = _dump(response)
+            return response
+        finally:
+            entry["latency"] = time.perf_counter() - started
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ReplayClient:
+    """Stand-in for ``AsyncOpenAI`` that serves a recorded cassette.
+
+    Parameters
+    ----------
+    path:
+        Cassette written by :class:`RecordingClient`.
+    speed:
+        Latency divisor; ``2`` replays twice as fast, ``0`` skips waiting.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0):
+        self.speed = speed
+        self._entries: dict[str, deque[dict]] = defaultdict(deque)
+        self._last: dict[str, dict] = {}
+        for entry in read_cassette(path):
+            key = request_key(entry["endpoint"], entry["request"])
+            self._entries[key].append(entry)
+        self.moderations = _Endpoint(self, "moderations", None)
+        self.chat = SimpleNamespace(completions=_Endpoint(self, "chat", None))
+
+    async def _call(self, endpoint: str, _create, kwargs: dict):
+        key = request_key(endpoint, kwargs)
+        queue = self._entries.get(key)
+        if queue:
+            entry = queue.popleft()
+            self._last[key] = entry
+        elif key in self._last:
+            # Requests repeated more often than recorded reuse the last answer.
+            entry = self._last[key]
+        else:
+            raise CassetteMissError(f"no recorded {endpoint} request matches")
+        if self.speed > 0:
+            await asyncio.sleep(entry.get("latency", 0.0) / self.speed)
+        error = entry.get("error")
+        if error is not None:
+            raise ReplayedAPIError(
+                f"{error['type']}: {error['message']}", error.get("status_code")
+            )
+        return _namespace(entry["response"])
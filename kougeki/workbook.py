@@ -0,0 +1,137 @@
+"""Reading, analyzing and writing multi-sheet Excel workbooks.
+
+Rows from every selected sheet are analyzed in one engine run, so they
+share the rate limiter, concurrency limit and results store, and the
+results are written back to the sheet each row came from.
+"""
+
+import logging
+from collections.abc import Sequence
+from typing import TYPE_CHECKING
+
+from . import engine
+from .config import settings
+from .models import RowResult
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+TEXT_COLUMN = "投稿内容"
+
+
+def select_sheets(available: list[str], spec: str | None = None) -> list[str]:
+    """Return the sheets chosen by ``spec`` in workbook order.
+
+    ``spec`` (default :attr:`kougeki.config.Settings.excel_sheets`) is empty
+    for the first sheet only, ``*`` for every sheet, or a comma-separated
+    list of sheet names.
+    """
+    spec = (settings.excel_sheets if spec is None else spec).strip()
+    if not spec:
+        return available[:1]
+    if spec == "*":
+        return list(available)
+    wanted = [name.strip() for name in spec.split(",") if name.strip()]
+    missing = [name for name in wanted if name not in available]
+    if missing:
+        raise ValueError(f"シートが見つかりません: {', '.join(missing)}")
+    return [name for name in available if name in wanted]
+
+
+def read_workbook(path) -> dict[str, "pd.DataFrame"]:
+    """Read every sheet of ``path`` into ``{name: DataFrame}``.
+
+    All sheets are kept so that :func:`write_workbook` can write back the
+    ones that were not analyzed; pick the analyzed ones with
+    :func:`select_sheets`.
+    """
+    import pandas as pd
+
+    with pd.ExcelFile(path) as book:
+        return {str(name): book.parse(name) for name in book.sheet_names}
+
+
+def write_workbook(path, frames: dict[str, "pd.DataFrame"]) -> None:
+    """Write each frame to the sheet of the same name in ``path``."""
+    import pandas as pd
+
+    with pd.ExcelWriter(path) as writer:
+        for name, df in frames.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+
+
+def collect_texts(
+    frames: dict[str, "pd.DataFrame"],
+    sheets: Sequence[str] | None = None,
+) -> tuple[list[str], list[tuple[str, int, int]]]:
+    """Concatenate the texts of the selected sheets.
+
+    ``sheets`` names the sheets to include (default: all of ``frames``).
+    Returns the texts and ``(sheet, start, end)`` spans locating each
+    sheet's rows in them. Sheets without a ``投稿内容`` column are skipped.
+    """
+    texts: list[str] = []
+    spans: list[tuple[str, int, int]] = []
+    for name in frames if sheets is None else sheets:
+        df = frames[name]
+        if TEXT_COLUMN not in df.columns:
+            logger.info("sheet %s has no %s column; skipped", name, TEXT_COLUMN)
+            continue
+        start = len(texts)
+        texts.extend(df[TEXT_COLUMN].tolist())
+        spans.append((name, start, len(texts)))
+    return texts, spans
+
+
+async def analyze_workbook(
+    frames: dict[str, "pd.DataFrame"],
+    sheets: Sequence[str] | None = None,
+    columns: Sequence[str] | None = None,
+    **kwargs,
+) -> list[RowResult]:
+    """Analyze the selected sheets in one :func:`kougeki.engine.analyze` run.
+
+    ``sheets`` is passed to :func:`collect_texts` and ``kwargs`` to
+    :func:`~kougeki.engine.analyze`. Results are added as columns (limited
+    to ``columns`` if given) to each analyzed frame in place and returned
+    in sheet order; other frames are left untouched. Raises
+    :class:`ValueError` when no selected sheet has a ``投稿内容`` column.
+    """
+    texts, spans = collect_texts(frames, sheets)
+    if not spans:
+        raise ValueError(f"「{TEXT_COLUMN}」列が見つかりません")
+    results = await engine.analyze(texts, **kwargs)
+    for name, start, end in spans:
+        engine.apply_results(frames[name], results[start:end], columns=columns)
+    logger.info(
+        "analyzed %s rows from %s sheets: %s",
+        len(texts),
+        len(spans),
+        ", ".join(f"{name}={end - start}" for name, start, end in spans),
+    )
+    return results
+
+
+async def backfill_workbook(frames: dict[str, "pd.DataFrame"], **kwargs) -> int:
+    """Re-analyze ``llm_pending`` rows of every sheet in one engine run.
+
+    ``kwargs`` are passed to :func:`kougeki.engine.analyze`. Returns the
+    number of rows attempted.
+    """
+    texts: list[str] = []
+    pending: list[tuple[str, list, int]] = []
+    for name, df in frames.items():
+        index = engine.pending_rows(df)
+        if index:
+            pending.append((name, index, len(texts)))
+            texts.extend(df.loc[index, TEXT_COLUMN].tolist())
+    if not texts:
+        return 0
+    results = await engine.analyze(texts, **kwargs)
+    for name, index, start in pending:
+        engine.apply_results(
+            frames[name], results[start : start + len(index)], index
+        )
+    return len(texts)
@@ -0,0 +1,36 @@
+import pathlib
+import sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from kougeki.models import (
+    AggressivenessResult,
+    ModerationCategories,
+    ModerationResult,
+    ModerationScores,
+    RowResult,
+)
+
+
+def make_moderation(hate: float = 0.0, violence: float = 0.0) -> ModerationResult:
+    """Moderation result flagging the categories whose score is above zero."""
+    scores = ModerationScores(hate, 0.0, 0.0, 0.0, 0.0, violence, 0.0)
+    return ModerationResult(
+        categories=ModerationCategories(
+            hate > 0, False, False, False, False, violence > 0, False
+        ),
+        scores=scores,
+    )
+
+
+def make_result(
+    score: int | None,
+    reason: str = "理由",
+    moderation: ModerationResult | None = None,
+) -> RowResult:
+    """Row scored ``score`` with an all-clear moderation result by default."""
+    return RowResult(
+        moderation=moderation or make_moderation(),
+        aggressiveness=AggressivenessResult(score=score, reason=reason),
+        overall=score,
+    )
@@ -0,0 +1,22 @@
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from kougeki import benchmark, services
+
+
+@pytest.mark.asyncio
+async def test_engine_outpaces_the_legacy_loop():
+    client = benchmark.SimulatedClient(latency=0.01)
+    before = services.__dict__.get("client")
+
+    result = await benchmark.compare([f"t{i}" for i in range(20)], client, concurrency=10)
+
+    assert result.rows == 20
+    # Sequential: two requests per row; the engine overlaps rows and requests.
+    assert result.legacy_seconds >= 0.4
+    assert result.engine_rows_per_second > 3 * result.legacy_rows_per_second
+    assert services.__dict__.get("client") is before
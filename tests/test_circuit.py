@@ -0,0 +1,95 @@
+import asyncio
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from kougeki import circuit, services
+from kougeki.circuit import CircuitBreaker, CircuitOpenError
+
+
+def test_breaker_opens_fails_fast_and_recovers(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(circuit.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker("chat", failure_rate=0.5, min_calls=4, open_seconds=10)
+
+    for ok in (True, True, False, False):
+        breaker.before_call()
+        breaker.record_success() if ok else breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    now[0] = 11
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    now[0] = 22
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_is_not_retried(monkeypatch):
+    calls = []
+
+    @services.retry(max_attempts=5, base_delay=0)
+    async def guarded():
+        calls.append(1)
+        raise CircuitOpenError("open")
+
+    with pytest.raises(CircuitOpenError):
+        await guarded()
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_frees_its_slot(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(circuit.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker("chat", min_calls=1, open_seconds=10)
+    monkeypatch.setitem(services.breakers, "chat", breaker)
+    breaker.record_failure()
+    now[0] = 11
+
+    started = asyncio.Event()
+
+    async def hang():
+        started.set()
+        await asyncio.sleep(3600)
+
+    probe = asyncio.create_task(services._guarded("chat", hang))
+    await started.wait()
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    async def ok():
+        return "ok"
+
+    assert await services._guarded("chat", ok) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_unanswered_probe_times_out(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(circuit.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker("chat", min_calls=1, open_seconds=10, probe_seconds=5)
+    breaker.record_failure()
+    now[0] = 11
+    breaker.before_call()
+    now[0] = 15
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    now[0] = 16
+    breaker.before_call()
+    assert breaker.probes == 1
@@ -0,0 +1,197 @@
+import pathlib
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from kougeki import engine
+from kougeki.circuit import CircuitOpenError
+from kougeki.models import AggressivenessResult
+
+from conftest import make_moderation
+
+
+@pytest.fixture
+def flaky_chat(monkeypatch):
+    attempts: dict[str, int] = {}
+
+    async def mock_moderate(text):
+        if text == "mod-broken":
+            raise RuntimeError("moderation down")
+        return make_moderation()
+
+    async def mock_ag_score(text):
+        attempts[text] = attempts.get(text, 0) + 1
+        if text == "broken" or (text == "flaky" and attempts[text] == 1):
+            raise RuntimeError("chat down")
+        return AggressivenessResult(score=4, reason="ok")
+
+    monkeypatch.setattr("kougeki.services.moderate_text", mock_moderate)
+    monkeypatch.setattr("kougeki.services.get_aggressiveness_score", mock_ag_score)
+    monkeypatch.setattr(
+        "kougeki.services.aggregate_aggressiveness", lambda scores, llm: llm
+    )
+    return attempts
+
+
+@pytest.mark.asyncio
+async def test_failed_rows_do_not_abort_the_run(flaky_chat):
+    results = await engine.analyze_texts(["ok", "broken", "mod-broken"])
+
+    assert results[0].error is None
+    assert results[0].overall == 4
+    assert results[1].error == "RuntimeError: chat down"
+    assert results[1].moderation is not None
+    assert results[1].aggressiveness.score is None
+    assert results[2].moderation is None
+    assert results[2].aggressiveness.score == 4
+
+    df = pd.DataFrame({"投稿内容": ["ok", "broken", "mod-broken"]})
+    engine.apply_results(df, results)
+    assert df["analysis_error"].isna().tolist() == [True, False, False]
+    assert df["hate_score"].isna().tolist() == [False, False, True]
+
+
+@pytest.mark.asyncio
+async def test_failed_rows_are_retried_once(flaky_chat, monkeypatch):
+    monkeypatch.setattr(engine.settings, "retry_failed_rows", True)
+    results = await engine.analyze(["ok", "flaky", "broken"], shards=1)
+
+    assert flaky_chat == {"ok": 1, "flaky": 2, "broken": 2}
+    assert results[1].error is None
+    assert results[2].error is not None
+
+
+@pytest.mark.asyncio
+async def test_cascade_only_sends_uncertain_rows_to_chat(monkeypatch):
+    signals = {"clean": 0.01, "unsure": 0.4, "violent": 0.95}
+    chat_calls = []
+    batches = []
+
+    async def mock_moderate_texts(texts):
+        batches.append(list(texts))
+        results = []
+        for text in texts:
+            mod = make_moderation()
+            mod.scores.violence = signals[text]
+            results.append(mod)
+        return results
+
+    async def mock_ag_score(text):
+        chat_calls.append(text)
+        return AggressivenessResult(score=5, reason="llm", model="chat")
+
+    monkeypatch.setattr("kougeki.services.moderate_texts", mock_moderate_texts)
+    monkeypatch.setattr("kougeki.services.get_aggressiveness_score", mock_ag_score)
+    monkeypatch.setattr(engine.settings, "cascade_enabled", True)
+    monkeypatch.setattr(engine.settings, "cascade_clean_below", 0.05)
+    monkeypatch.setattr(engine.settings, "cascade_severe_above", 0.8)
+    monkeypatch.setattr(engine.settings, "moderation_batch_size", 2)
+
+    results = await engine.analyze_texts(["clean", "unsure", "violent"])
+
+    assert batches == [["clean", "unsure"], ["violent"]]
+    assert chat_calls == ["unsure"]
+    assert [res.aggressiveness.source for res in results] == [
+        "moderation",
+        "llm",
+        "moderation",
+    ]
+    assert results[0].overall == 0
+    assert results[2].overall == 9
+    assert results[1].overall is not None
+
+
+@pytest.mark.asyncio
+async def test_borderline_scores_are_escalated(monkeypatch):
+    first_scores = {"calm": 1, "borderline": 4, "unparsed": None}
+    calls = []
+
+    async def mock_moderate(text):
+        return make_moderation()
+
+    async def mock_ag_score(text, model=None):
+        calls.append((text, model))
+        if model == "strong":
+            return AggressivenessResult(score=6, reason="strong", model="strong")
+        return AggressivenessResult(
+            score=first_scores[text], reason="fast", model="fast"
+        )
+
+    monkeypatch.setattr("kougeki.services.moderate_text", mock_moderate)
+    monkeypatch.setattr("kougeki.services.get_aggressiveness_score", mock_ag_score)
+    monkeypatch.setattr(engine.settings, "escalation_model", "strong")
+    monkeypatch.setattr(engine.settings, "escalation_min_score", 3)
+    monkeypatch.setattr(engine.settings, "escalation_max_score", 6)
+
+    results = await engine.analyze_texts(["calm", "borderline", "unparsed"])
+
+    assert sorted(text for text, model in calls if model == "strong") == [
+        "borderline",
+        "unparsed",
+    ]
+    assert results[0].aggressiveness.model == "fast"
+    assert results[0].first_pass is None
+    assert results[1].aggressiveness.score == 6
+    assert results[1].first_pass.score == 4
+    record = engine.result_record(results[2])
+    assert record["aggressiveness_model"] == "strong"
+    assert record["aggressiveness_score_first_pass"] is None
+    assert record["aggressiveness_reason_first_pass"] == "fast"
+
+
+@pytest.mark.asyncio
+async def test_open_chat_circuit_degrades_to_moderation_only(monkeypatch):
+    async def mock_moderate(text):
+        mod = make_moderation()
+        mod.scores.hate = 0.5
+        return mod
+
+    async def mock_ag_score(text):
+        if text == "pending":
+            raise CircuitOpenError("chat circuit is open")
+        return AggressivenessResult(score=2, reason="ok", model="chat")
+
+    monkeypatch.setattr("kougeki.services.moderate_text", mock_moderate)
+    monkeypatch.setattr("kougeki.services.get_aggressiveness_score", mock_ag_score)
+
+    results = await engine.analyze_texts(["ok", "pending"])
+    assert results[1].llm_pending is True
+    assert results[1].error is None
+    assert results[1].aggressiveness.score is None
+    assert results[1].overall == 4
+
+    df = pd.DataFrame({"投稿内容": ["ok", "pending"]})
+    engine.apply_results(df, results)
+    assert engine.pending_rows(df) == [1]
+
+    async def recovered(text):
+        return AggressivenessResult(score=7, reason="later", model="chat")
+
+    monkeypatch.setattr("kougeki.services.get_aggressiveness_score", recovered)
+    assert await engine.backfill(df) == 1
+    assert df.loc[1, "aggressiveness_score"] == 7
+    assert df.loc[0, "aggressiveness_score"] == 2
+    assert engine.pending_rows(df) == []
+
+
+def test_apply_results_can_limit_to_legacy_columns():
+    df = pd.DataFrame({"投稿内容": ["a"]})
+    res = engine.RowResult(
+        moderation=make_moderation(),
+        aggressiveness=AggressivenessResult(score=2, reason="r"),
+        overall=3,
+    )
+
+    engine.apply_results(df, [res], columns=engine.LEGACY_COLUMNS)
+
+    assert list(df.columns) == [
+        "投稿内容",
+        *engine.LEGACY_COLUMNS,
+        "analysis_error",
+        "llm_pending",
+    ]
+    assert df.loc[0, "hate/threatening_flag"] == False  # noqa: E712
+    assert df.loc[0, "aggressiveness_reason"] == "r"
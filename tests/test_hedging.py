@@ -0,0 +1,92 @@
+import asyncio
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from kougeki.hedging import HedgingPolicy
+
+
+def warmed_policy(**kwargs) -> HedgingPolicy:
+    policy = HedgingPolicy(min_samples=5, **kwargs)
+    policy.latencies.extend([0.01] * 20)
+    policy.requests = 100
+    return policy
+
+
+@pytest.mark.asyncio
+async def test_slow_request_is_hedged_and_loser_cancelled():
+    policy = warmed_policy(budget=0.5)
+    calls = []
+    cancelled = []
+
+    async def call():
+        attempt = len(calls)
+        calls.append(attempt)
+        try:
+            await asyncio.sleep(1.0 if attempt == 0 else 0)
+        except asyncio.CancelledError:
+            cancelled.append(attempt)
+            raise
+        return attempt
+
+    assert await policy.run(call) == 1
+    await asyncio.sleep(0)
+    assert cancelled == [0]
+    assert policy.stats()["hedges"] == 1
+    assert policy.stats()["hedge_wins"] == 1
+
+
+@pytest.mark.asyncio
+async def test_hedging_respects_budget_and_warmup():
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    cold = HedgingPolicy(min_samples=5)
+    assert await cold.run(call) == "ok"
+
+    exhausted = warmed_policy(budget=0.0)
+    assert await exhausted.run(call) == "ok"
+    assert len(calls) == 2
+    assert exhausted.hedges == 0
+
+
+@pytest.mark.asyncio
+async def test_hedge_falls_back_when_one_copy_fails():
+    policy = warmed_policy(budget=0.5)
+    calls = []
+
+    async def call():
+        attempt = len(calls)
+        calls.append(attempt)
+        if attempt == 0:
+            await asyncio.sleep(0.05)
+            return "primary"
+        raise RuntimeError("hedge failed")
+
+    assert await policy.run(call) == "primary"
+    assert policy.hedge_wins == 0
+
+
+@pytest.mark.asyncio
+async def test_waiting_for_a_request_slot_is_not_latency():
+    policy = warmed_policy(budget=0.5)
+    throttled = []
+
+    async def throttle():
+        throttled.append(1)
+        await asyncio.sleep(0.2)
+
+    async def call():
+        return "ok"
+
+    assert await policy.run(call, throttle=throttle) == "ok"
+    assert throttled == [1]
+    assert policy.hedges == 0
+    assert policy.latencies[-1] < 0.1
@@ -0,0 +1,99 @@
+import json
+import logging
+import multiprocessing
+import pathlib
+import sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from kougeki import logging_config
+from kougeki.config import settings
+
+
+def make_record(msg: str, *args, level: int = logging.ERROR) -> logging.LogRecord:
+    return logging.LogRecord("kougeki.test", level, __file__, 1, msg, args, None)
+
+
+def test_repeat_filter_collapses_repeated_errors(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(logging_config.time, "monotonic", lambda: now[0])
+    repeat = logging_config.RepeatFilter(interval=10)
+
+    assert repeat.filter(make_record("%s failed (attempt %s)", "create", 1))
+    assert not repeat.filter(make_record("%s failed (attempt %s)", "create", 2))
+    assert not repeat.filter(make_record("%s failed (attempt %s)", "create", 3))
+    assert repeat.filter(make_record("other failure"))
+    assert repeat.filter(make_record("%s failed", level=logging.INFO))
+
+    now[0] += 11
+    record = make_record("%s failed (attempt %s)", "create", 1)
+    assert repeat.filter(record)
+    assert record.suppressed == 2
+    assert record.getMessage().endswith("[2 similar messages suppressed]")
+
+
+def test_setup_logging_writes_json_lines_with_row_ids(monkeypatch, tmp_path):
+    log_file = tmp_path / "kougeki.log"
+    monkeypatch.setattr(settings, "log_file", str(log_file))
+    monkeypatch.setattr(settings, "log_json", True)
+    logger = logging.getLogger("kougeki.test")
+    logging_config.setup_logging()
+    try:
+        token = logging_config.row_id.set(42)
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("row %s failed", 42)
+        finally:
+            logging_config.row_id.reset(token)
+        logger.info("done")
+    finally:
+        logging_config.stop_logging()
+
+    lines = [json.loads(line) for line in log_file.read_text("utf-8").splitlines()]
+    assert lines[0]["message"] == "row 42 failed"
+    assert lines[0]["row"] == 42
+    assert "ValueError: boom" in lines[0]["exception"]
+    assert lines[1] == {
+        "time": lines[1]["time"],
+        "level": "INFO",
+        "logger": "kougeki.test",
+        "message": "done",
+    }
+
+
+def test_worker_records_are_relayed_to_the_parent(monkeypatch, tmp_path):
+    log_file = tmp_path / "kougeki.log"
+    monkeypatch.setattr(settings, "log_file", str(log_file))
+    monkeypatch.setattr(settings, "log_json", True)
+    log_queue = multiprocessing.get_context("spawn").Queue()
+    logger = logging.getLogger("kougeki.test")
+    root_logger = logging.getLogger()
+    saved = root_logger.handlers[:], root_logger.level
+
+    # What a shard worker does: its records go to the queue, picklable.
+    logging_config.setup_worker_logging(log_queue, logging.INFO)
+    try:
+        for row in (7, 8):
+            token = logging_config.row_id.set(row)
+            try:
+                raise ValueError("boom")
+            except ValueError:
+                logger.exception("row %s failed", row)
+            finally:
+                logging_config.row_id.reset(token)
+    finally:
+        root_logger.handlers[:], level = saved
+        root_logger.setLevel(level)
+
+    logging_config.setup_logging()
+    relay = logging_config.relay_worker_logs(log_queue)
+    relay.stop()
+    logging_config.stop_logging()
+
+    lines = [json.loads(line) for line in log_file.read_text("utf-8").splitlines()]
+    # The second row's error is a repeat of the first and is suppressed.
+    assert len(lines) == 1
+    assert lines[0]["message"] == "row 7 failed"
+    assert lines[0]["row"] == 7
+    assert "ValueError: boom" in lines[0]["exception"]
@@ -0,0 +1,50 @@
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from kougeki import parsing
+
+
+@pytest.fixture(autouse=True)
+def fresh_stats(monkeypatch):
+    monkeypatch.setattr(parsing, "parse_stats", parsing.ParseStats())
+
+
+@pytest.mark.parametrize(
+    "content, expected",
+    [
+        ('```json\n{"score": 4, "reason": "皮肉"}\n```', (4, "皮肉")),
+        ('回答: {"score": 7, "reason": "侮辱"} 以上です。', (7, "侮辱")),
+        ('{"score": "6", "reason": "明確な批判"}', (6, "明確な批判")),
+        ('{"score": 12, "reason": "脅迫"}', (9, "脅迫")),
+        ('{"score": 3, "reason": "途中で切れ', (3, "途中で切れ")),
+        ("スコア: 5\n理由: 配慮に欠ける", (5, "配慮に欠ける")),
+    ],
+)
+def test_malformed_answers_are_salvaged(content, expected):
+    assert parsing.parse_aggressiveness(content) == expected
+    assert parsing.parse_stats.as_dict() == {"ok": 0, "salvaged": 1, "lost": 0}
+
+
+def test_valid_and_lost_answers_are_counted():
+    assert parsing.parse_aggressiveness('{"score": 2, "reason": "軽度"}') == (2, "軽度")
+    assert parsing.parse_aggressiveness("これはJSONではありません") == (None, None)
+    assert parsing.parse_aggressiveness("") == (None, None)
+    assert parsing.parse_stats.as_dict() == {"ok": 1, "salvaged": 0, "lost": 2}
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        '{"score": "Infinity", "reason": "x"}',
+        '{"score": Infinity, "reason": "x"}',
+        '{"score": NaN, "reason": "x"}',
+        "score: " + "9" * 400,
+    ],
+)
+def test_non_finite_scores_are_lost(content):
+    assert parsing.parse_aggressiveness(content) == (None, None)
+    assert parsing.parse_stats.as_dict() == {"ok": 0, "salvaged": 0, "lost": 1}
@@ -0,0 +1,53 @@
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from kougeki import preflight
+
+
+@pytest.fixture(autouse=True)
+def approximate_tokens(monkeypatch):
+    monkeypatch.setattr(preflight, "_encoding", None)
+
+
+def test_count_tokens_approximation():
+    assert preflight.count_tokens("abcdefgh") == 2
+    assert preflight.count_tokens("攻撃的") == 3
+    assert preflight.count_tokens("ab攻撃") == 3
+
+
+def test_truncate_text_respects_limit():
+    text, truncated = preflight.truncate_text("あ" * 50, max_tokens=10)
+    assert truncated is True
+    assert text == "あ" * 10
+    assert preflight.truncate_text("short", max_tokens=10) == ("short", False)
+    assert preflight.truncate_text("あ" * 50, max_tokens=0) == ("あ" * 50, False)
+
+
+def test_estimate_reports_tokens_cost_and_time(monkeypatch):
+    monkeypatch.setattr(preflight, "prompt_overhead_tokens", lambda: 100)
+    settings = preflight.settings
+    monkeypatch.setattr(settings, "max_input_tokens", 20)
+    monkeypatch.setattr(settings, "expected_output_tokens", 10)
+    monkeypatch.setattr(settings, "expected_latency_seconds", 2.0)
+    monkeypatch.setattr(settings, "tokens_per_minute", 0)
+    monkeypatch.setattr(settings, "chat_input_price_per_million", 1.0)
+    monkeypatch.setattr(settings, "chat_output_price_per_million", 2.0)
+
+    report = preflight.estimate(
+        ["あ" * 5, "い" * 30], concurrency=1, shards=1, requests_per_second=0
+    )
+    assert report.input_tokens == (5 + 100) + (20 + 100)
+    assert report.output_tokens == 20
+    assert report.truncated_rows == [1]
+    assert report.cost_usd == pytest.approx((225 * 1.0 + 20 * 2.0) / 1_000_000)
+    assert report.seconds == pytest.approx(4.0)
+    assert "2件" in report.summary()
+
+    limited = preflight.estimate(
+        ["a"] * 10, concurrency=10, shards=1, requests_per_second=1
+    )
+    assert limited.seconds == pytest.approx(20.0)
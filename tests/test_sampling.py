@@ -0,0 +1,104 @@
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from kougeki import sampling
+from kougeki.models import AggressivenessResult
+
+from conftest import make_moderation
+
+
+@pytest.fixture
+def scored_by_text(monkeypatch):
+    calls: list[str] = []
+
+    async def mock_moderate(text):
+        return make_moderation()
+
+    async def mock_ag_score(text):
+        calls.append(text)
+        return AggressivenessResult(score=int(text.split(":")[0]), reason="")
+
+    monkeypatch.setattr("kougeki.services.moderate_text", mock_moderate)
+    monkeypatch.setattr("kougeki.services.get_aggressiveness_score", mock_ag_score)
+    monkeypatch.setattr(
+        "kougeki.services.aggregate_aggressiveness", lambda scores, llm: llm
+    )
+    return calls
+
+
+def test_allocate_is_proportional_with_a_minimum():
+    assert sampling.allocate({"a": 900, "b": 90, "c": 10}, 100) == {
+        "a": 90,
+        "b": 9,
+        "c": 2,
+    }
+    assert sampling.allocate({"a": 1}, 100) == {"a": 1}
+
+
+def test_census_of_a_stratum_has_no_sampling_error():
+    est = sampling.stratified_estimate({"a": 3}, {"a": [0.0, 1.0, 1.0]})
+
+    assert est.value == pytest.approx(2 / 3)
+    assert est.margin == 0
+
+
+def test_unanimous_sample_still_has_an_interval():
+    est = sampling.stratified_share({"a": 500_000}, {"a": (0, 400)})
+
+    assert est.value == 0
+    assert est.low == 0
+    assert 0.005 < est.high < 0.015
+
+
+@pytest.mark.asyncio
+async def test_unanimous_first_round_does_not_stop_sampling(scored_by_text):
+    texts = [f"0:{i}" for i in range(1000)]
+
+    report = await sampling.sample_estimate(
+        texts, size=50, step=50, target_margin=0.02, seed=3
+    )
+
+    assert report.scored > 50
+    assert report.aggressive_share.margin <= 0.02
+
+
+@pytest.mark.asyncio
+async def test_sample_estimate_weights_strata(scored_by_text):
+    # 150 short aggressive posts and 50 long calm ones.
+    texts = [f"9:{i}" for i in range(150)] + [f"0:{i}" + "x" * 60 for i in range(50)]
+
+    report = await sampling.sample_estimate(texts, size=40, seed=1)
+
+    assert report.population == 200
+    assert report.scored == len(scored_by_text) == 40
+    assert report.strata == {"0-49文字": (150, 30), "50-199文字": (50, 10)}
+    assert report.aggressive_share.value == pytest.approx(0.75)
+    assert report.distribution[9].value == pytest.approx(0.75)
+    assert report.mean.value == pytest.approx(6.75)
+
+
+@pytest.mark.asyncio
+async def test_sample_estimate_grows_until_target_margin(scored_by_text):
+    texts = [f"{score}:{i}" for i in range(30) for score in (0, 7)]
+
+    report = await sampling.sample_estimate(
+        texts, size=10, step=10, target_margin=0.0, seed=2
+    )
+
+    # Only a full census reaches a zero margin.
+    assert report.scored == 60
+    assert report.aggressive_share.value == pytest.approx(0.5)
+    assert report.aggressive_share.margin == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "kwargs", [{"size": 0}, {"step": -5}, {"max_rows": 0}]
+)
+async def test_sample_estimate_rejects_non_positive_sizes(kwargs):
+    with pytest.raises(ValueError):
+        await sampling.sample_estimate(["a", "b"], target_margin=0.01, **kwargs)
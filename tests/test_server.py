@@ -0,0 +1,105 @@
+import asyncio
+import json
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from kougeki import server
+
+from conftest import make_result
+
+
+@pytest.fixture
+def analyzed(monkeypatch):
+    calls: list[list[str]] = []
+
+    async def mock_analyze_texts(texts, concurrency=None, on_progress=None):
+        calls.append(list(texts))
+        await asyncio.sleep(0.01)
+        return [make_result(len(text), text) for text in texts]
+
+    monkeypatch.setattr("kougeki.engine.analyze_texts", mock_analyze_texts)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_requests_are_coalesced(analyzed):
+    service = server.ScoringService(cache_size=0)
+    first, second = await asyncio.gather(service.score("abc"), service.score("abc"))
+    assert first is second
+    assert analyzed == [["abc"]]
+
+
+@pytest.mark.asyncio
+async def test_batch_uses_cache_and_keeps_order(analyzed):
+    service = server.ScoringService()
+    await service.score("a")
+    status, payload = await service.dispatch(
+        "POST", "/score/batch", json.dumps({"texts": ["bb", "a", "bb"]}).encode()
+    )
+    assert status == 200
+    assert [row["aggressiveness_reason"] for row in payload["results"]] == [
+        "bb",
+        "a",
+        "bb",
+    ]
+    assert analyzed == [["a"], ["bb"]]
+
+
+@pytest.mark.asyncio
+async def test_http_score_endpoint(analyzed):
+    service = server.ScoringService()
+    srv = await asyncio.start_server(service.handle_connection, "127.0.0.1", 0)
+    port = srv.sockets[0].getsockname()[1]
+    async with srv:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        body = json.dumps({"text": "攻撃"}).encode()
+        writer.write(
+            b"POST /score HTTP/1.1\r\nHost: x\r\n"
+            + f"Content-Length: {len(body)}\r\n\r\n".encode()
+            + body
+        )
+        raw = await reader.read()
+        writer.close()
+    head, _, data = raw.partition(b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 200")
+    assert json.loads(data)["aggressiveness_reason"] == "攻撃"
+
+
+@pytest.mark.asyncio
+async def test_invalid_requests_are_rejected(analyzed):
+    service = server.ScoringService()
+    assert (await service.dispatch("POST", "/score", b"not json"))[0] == 400
+    assert (await service.dispatch("POST", "/score", b'{"text": 1}'))[0] == 400
+    assert (await service.dispatch("GET", "/score", b""))[0] == 405
+    assert (await service.dispatch("POST", "/nope", b""))[0] == 404
+    assert analyzed == []
+
+
+@pytest.mark.asyncio
+async def test_waiter_survives_cancelled_owner(monkeypatch):
+    release = asyncio.Event()
+    calls: list[list[str]] = []
+
+    async def mock_analyze_texts(texts, concurrency=None, on_progress=None):
+        calls.append(list(texts))
+        if len(calls) == 1:
+            await release.wait()
+        return [make_result(len(text), text) for text in texts]
+
+    monkeypatch.setattr("kougeki.engine.analyze_texts", mock_analyze_texts)
+    service = server.ScoringService(cache_size=0)
+    owner = asyncio.create_task(service.score("x"))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(service.score("x"))
+    await asyncio.sleep(0)
+
+    owner.cancel()
+    result = await asyncio.wait_for(waiter, timeout=1)
+
+    assert result.aggressiveness.reason == "x"
+    assert calls == [["x"], ["x"]]
+    assert owner.cancelled()
@@ -152,3 +152,19 @@ def test_aggregate_aggressiveness_from_settings(monkeypatch):
     monkeypatch.setattr(services.settings, "violence_weight", 0.0)
     result = services.aggregate_aggressiveness(scores, 7)
     assert result == 0
+
+
+def test_aggregate_aggressiveness_derived_score_is_not_reweighted():
+    scores = services.ModerationScores(
+        hate=0.9,
+        hate_threatening=0,
+        self_harm=0,
+        sexual=0,
+        sexual_minors=0,
+        violence=0.1,
+        violence_graphic=0,
+    )
+    derived = services.derive_aggressiveness(scores)
+    assert derived.source == "moderation"
+    assert derived.score == 8
+    assert services.aggregate_aggressiveness(scores, derived.score, derived=True) == 8
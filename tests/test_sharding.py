@@ -0,0 +1,98 @@
+import asyncio
+import multiprocessing
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from kougeki import engine, sharding
+from kougeki.models import AggressivenessResult
+from kougeki.ratelimit import SharedRateLimiter
+
+
+def test_split_ranges_covers_input_in_order():
+    assert sharding.split_ranges(10, 3) == [(0, 4), (4, 7), (7, 10)]
+    assert sharding.split_ranges(2, 4) == [(0, 1), (1, 2)]
+    assert sharding.split_ranges(0, 4) == []
+
+
+def test_shared_rate_limiter_spaces_slots(monkeypatch):
+    monkeypatch.setattr("kougeki.ratelimit.time.time", lambda: 100.0)
+    next_slot = multiprocessing.get_context("spawn").Value("d", 0.0)
+    first = SharedRateLimiter(10, next_slot)
+    second = SharedRateLimiter(10, next_slot)
+    assert first._reserve() == 0
+    assert second._reserve() == pytest.approx(0.1)
+    assert first._reserve() == pytest.approx(0.2)
+
+
+@pytest.mark.asyncio
+async def test_analyze_texts_preserves_order(monkeypatch):
+    async def mock_ag_score(text):
+        await asyncio.sleep(0.01 if text == "slow" else 0)
+        return AggressivenessResult(score=len(text), reason=text)
+
+    class Mod:
+        scores = None
+
+    async def mock_moderate_obj(_):
+        return Mod()
+
+    monkeypatch.setattr("kougeki.services.moderate_text", mock_moderate_obj)
+    monkeypatch.setattr("kougeki.services.get_aggressiveness_score", mock_ag_score)
+    monkeypatch.setattr(
+        "kougeki.services.aggregate_aggressiveness", lambda scores, llm: llm
+    )
+
+    progress = []
+    results = await engine.analyze_texts(
+        ["slow", "a", "bb"], concurrency=3, on_progress=lambda c, t: progress.append(c)
+    )
+    assert [res.aggressiveness.reason for res in results] == ["slow", "a", "bb"]
+    assert progress == [1, 2, 3]
+
+
+def test_shard_counters_are_merged_into_the_parent(monkeypatch):
+    from kougeki import parsing, services
+
+    monkeypatch.setattr(parsing, "parse_stats", parsing.ParseStats(ok=5))
+    monkeypatch.setattr(services, "hedging_policies", {})
+    services.hedging_policy("m").requests = 5
+
+    async def mock_analyze_texts(texts, concurrency=None, on_progress=None, row_ids=None):
+        parsing.parse_stats.ok += len(texts)
+        parsing.parse_stats.salvaged += 1
+        policy = services.hedging_policy("m")
+        policy.requests += len(texts)
+        policy.hedges += 1
+        policy.hedge_wins += 1
+        return []
+
+    monkeypatch.setattr(engine, "analyze_texts", mock_analyze_texts)
+    # A worker that already ran another shard reports only this shard's counts.
+    _, _, counters = sharding._run_shard(0, ["a", "b"], 2, [0, 1])
+    assert counters["parse"] == {"ok": 2, "salvaged": 1, "lost": 0}
+    assert counters["hedging"] == {"m": {"requests": 2, "hedges": 1, "hedge_wins": 1}}
+
+    monkeypatch.setattr(parsing, "parse_stats", parsing.ParseStats())
+    monkeypatch.setattr(services, "hedging_policies", {})
+    sharding._merge_counters(counters)
+    sharding._merge_counters(counters)
+    assert parsing.parse_stats.as_dict() == {"ok": 4, "salvaged": 2, "lost": 0}
+    assert services.hedging_policies["m"].stats()["hedge_wins"] == 2
+
+
+def test_workers_count_finished_rows(monkeypatch):
+    rows_done = multiprocessing.get_context("spawn").Value("q", 3)
+    monkeypatch.setattr(sharding, "_rows_done", rows_done)
+
+    async def mock_analyze_texts(texts, concurrency=None, on_progress=None, row_ids=None):
+        for completed in range(1, len(texts) + 1):
+            on_progress(completed, len(texts))
+        return []
+
+    monkeypatch.setattr(engine, "analyze_texts", mock_analyze_texts)
+    sharding._run_shard(0, ["a", "b"], 2, [0, 1])
+    assert rows_done.value == 5
@@ -0,0 +1,40 @@
+import pathlib
+import subprocess
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+#: Upper bound for importing the GUI controller and the CLI, in seconds.
+IMPORT_BUDGET_SECONDS = 1.0
+
+HEAVY_MODULES = ("pandas", "openai", "tiktoken")
+
+
+def run_import(code: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def test_startup_does_not_import_heavy_modules():
+    proc = run_import(
+        "import sys, kougeki.controller, kougeki.cli; "
+        f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules])"
+    )
+    assert proc.stdout.strip() == "[]"
+
+
+def test_startup_import_time_budget():
+    proc = run_import("import kougeki.controller, kougeki.cli")
+    cumulative_us = 0
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() in ("kougeki.controller", "kougeki.cli"):
+            cumulative_us += int(parts[1])
+    assert cumulative_us > 0
+    assert cumulative_us / 1_000_000 < IMPORT_BUDGET_SECONDS
@@ -0,0 +1,142 @@
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from kougeki import engine, services
+from kougeki.models import RowResult
+from kougeki.store import ResultStore, text_hash
+
+from conftest import make_moderation, make_result
+
+
+def test_store_roundtrip_and_history(tmp_path):
+    store = ResultStore(str(tmp_path / "results.db"))
+    flagged = make_moderation(hate=0.4, violence=0.5)
+    store.add_many(
+        ["a", "b"],
+        [make_result(3, moderation=flagged), make_result(None, moderation=flagged)],
+        "m",
+        "v1",
+    )
+
+    found = store.lookup(["a", "b", "c"], ["m"], "v1")
+    assert list(found) == [text_hash("a")]
+    assert found[text_hash("a")].moderation == flagged
+    assert found[text_hash("a")].aggressiveness.score == 3
+    assert found[text_hash("a")].aggressiveness.model == "m"
+    assert store.lookup(["a"], ["m"], "v2") == {}
+
+    history = store.history(text="a")
+    assert len(history) == 1
+    assert history[0]["violence_score"] == 0.5
+    assert store.export_csv(str(tmp_path / "out.csv")) == 2
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_analyze_uses_store_as_warm_cache(tmp_path, monkeypatch):
+    store = ResultStore(str(tmp_path / "results.db"))
+    store.add_many(
+        ["known"],
+        [make_result(7)],
+        services.settings.chat_model,
+        services.PROMPT_VERSION,
+        services.settings.max_input_tokens,
+    )
+    calls = []
+
+    async def mock_analyze_texts(texts, concurrency=None, on_progress=None, row_ids=None):
+        calls.append(list(texts))
+        return [make_result(1) for _ in texts]
+
+    monkeypatch.setattr(engine, "analyze_texts", mock_analyze_texts)
+    results = await engine.analyze(["new", "known"], shards=1, store=store)
+
+    assert calls == [["new"]]
+    assert [res.overall for res in results] == [1, 7]
+    assert len(store.history(text="new")) == 1
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_cascade_rows_are_warm_cache_hits(tmp_path, monkeypatch):
+    store = ResultStore(str(tmp_path / "results.db"))
+    calm = make_moderation()
+    derived = RowResult(
+        moderation=calm,
+        aggressiveness=services.derive_aggressiveness(calm.scores),
+        overall=0,
+    )
+    store.add_many(
+        ["calm"],
+        [derived],
+        services.settings.chat_model,
+        services.PROMPT_VERSION,
+        services.settings.max_input_tokens,
+    )
+    monkeypatch.setattr(services.settings, "cascade_enabled", True)
+
+    async def fail_analyze_texts(*args, **kwargs):
+        raise AssertionError("should be answered from the store")
+
+    monkeypatch.setattr(engine, "analyze_texts", fail_analyze_texts)
+    (res,) = await engine.analyze(["calm"], shards=1, store=store)
+
+    assert res.aggressiveness.source == "moderation"
+    assert res.aggressiveness.model == services.settings.moderation_model
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_borderline_rows_are_escalated_despite_the_store(tmp_path, monkeypatch):
+    store = ResultStore(str(tmp_path / "results.db"))
+    store.add_many(
+        ["borderline", "clear"],
+        [make_result(4), make_result(8)],
+        services.settings.chat_model,
+        services.PROMPT_VERSION,
+        services.settings.max_input_tokens,
+    )
+    monkeypatch.setattr(services.settings, "escalation_model", "strong")
+    calls = []
+
+    async def mock_analyze_texts(texts, concurrency=None, on_progress=None, row_ids=None):
+        calls.append(list(texts))
+        return [make_result(6) for _ in texts]
+
+    monkeypatch.setattr(engine, "analyze_texts", mock_analyze_texts)
+    results = await engine.analyze(["borderline", "clear"], shards=1, store=store)
+
+    assert calls == [["borderline"]]
+    assert [res.overall for res in results] == [6, 8]
+    store.close()
+
+
+def test_older_databases_gain_new_columns(tmp_path):
+    path = str(tmp_path / "old.db")
+    store = ResultStore(path)
+    store.add_many(["a"], [make_result(3)], "m", "v1")
+    for column in ("aggressiveness_source", "input_truncated", "max_input_tokens"):
+        store.conn.execute(f"ALTER TABLE results DROP COLUMN {column}")
+    store.close()
+
+    store = ResultStore(path)
+    columns = {row["name"] for row in store.conn.execute("PRAGMA table_info(results)")}
+    assert {"aggressiveness_source", "input_truncated", "max_input_tokens"} <= columns
+    assert store.lookup(["a"], ["m"], "v1")[text_hash("a")].aggressiveness.source == "llm"
+    store.close()
+
+
+def test_truncation_is_stored_and_keyed_by_limit(tmp_path):
+    store = ResultStore(str(tmp_path / "results.db"))
+    truncated = make_result(5)
+    truncated.truncated = True
+    store.add_many(["long"], [truncated], "m", "v1", max_input_tokens=2000)
+
+    found = store.lookup(["long"], ["m"], "v1", max_input_tokens=2000)
+    assert found[text_hash("long")].truncated is True
+    assert store.lookup(["long"], ["m"], "v1", max_input_tokens=500) == {}
+    store.close()
@@ -0,0 +1,117 @@
+import pathlib
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from kougeki import services
+from kougeki.transport import (
+    CassetteMissError,
+    RecordingClient,
+    ReplayClient,
+    ReplayedAPIError,
+)
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+class FakeClient:
+    def __init__(self):
+        self.chat_calls = 0
+
+        async def chat_create(**kwargs):
+            self.chat_calls += 1
+            if self.chat_calls == 1:
+                raise RateLimited("slow down")
+            message = SimpleNamespace(content='{"score": 3, "reason": "r"}')
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+        async def moderation_create(**kwargs):
+            return SimpleNamespace(results=[SimpleNamespace(flagged=False)])
+
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=chat_create))
+        self.moderations = SimpleNamespace(create=moderation_create)
+
+
+@pytest.mark.asyncio
+async def test_record_then_replay(tmp_path):
+    cassette = str(tmp_path / "cassette.jsonl.gz")
+    recorder = RecordingClient(FakeClient(), cassette)
+    request = {"model": "m", "messages": [{"role": "user", "content": "x"}]}
+    with pytest.raises(RateLimited):
+        await recorder.chat.completions.create(**request)
+    await recorder.chat.completions.create(**request)
+    await recorder.moderations.create(input="x", model="mod")
+    recorder.close()
+
+    replay = ReplayClient(cassette, speed=0)
+    with pytest.raises(ReplayedAPIError) as excinfo:
+        await replay.chat.completions.create(**request)
+    assert excinfo.value.status_code == 429
+    response = await replay.chat.completions.create(**request)
+    assert response.choices[0].message.content.startswith('{"score": 3')
+    # Requests repeated beyond the recording reuse the last answer.
+    assert (await replay.chat.completions.create(**request)).choices
+    assert (await replay.moderations.create(input="x", model="mod")).results[0].flagged is False
+    with pytest.raises(CassetteMissError):
+        await replay.moderations.create(input="other", model="mod")
+
+
+@pytest.mark.asyncio
+async def test_services_use_replay_client(tmp_path, monkeypatch):
+    cassette = str(tmp_path / "cassette.jsonl.gz")
+    recorder = RecordingClient(FakeClient(), cassette)
+    monkeypatch.setattr(services, "client", recorder)
+    monkeypatch.setattr(services.settings, "hedge_enabled", False)
+    with pytest.raises(RateLimited):
+        await services.get_aggressiveness_score.__wrapped__("テキスト")
+    result = await services.get_aggressiveness_score.__wrapped__("テキスト")
+    recorder.close()
+    assert result.score == 3
+
+    monkeypatch.setattr(services.settings, "cassette_mode", "replay")
+    monkeypatch.setattr(services.settings, "cassette_path", cassette)
+    monkeypatch.setattr(services.settings, "replay_speed", 0.0)
+    monkeypatch.delitem(services.__dict__, "client")
+    assert isinstance(services.get_client(), ReplayClient)
+    with pytest.raises(ReplayedAPIError):
+        await services.get_aggressiveness_score.__wrapped__("テキスト")
+    assert (await services.get_aggressiveness_score.__wrapped__("テキスト")).score == 3
+
+
+@pytest.mark.asyncio
+async def test_unclosed_cassette_replays_and_appends(tmp_path):
+    cassette = str(tmp_path / "cassette.jsonl.gz")
+    recorder = RecordingClient(FakeClient(), cassette)
+    await recorder.moderations.create(input="a", model="mod")
+    # Entries are flushed but the gzip end marker is missing, as after a kill.
+    replay = ReplayClient(cassette, speed=0)
+    assert (await replay.moderations.create(input="a", model="mod")).results
+
+    second = RecordingClient(FakeClient(), cassette)
+    await second.moderations.create(input="b", model="mod")
+    second.close()
+    replay = ReplayClient(cassette, speed=0)
+    assert (await replay.moderations.create(input="a", model="mod")).results
+    assert (await replay.moderations.create(input="b", model="mod")).results
+
+
+@pytest.mark.asyncio
+async def test_recording_does_not_shard(monkeypatch):
+    from kougeki import engine, sharding
+
+    monkeypatch.setattr(services.settings, "cassette_mode", "record")
+
+    def fail_sharded(*args, **kwargs):
+        raise AssertionError("recording must stay in one process")
+
+    async def fake_analyze_texts(texts, concurrency=None, on_progress=None, row_ids=None):
+        return [SimpleNamespace(error=None, llm_pending=False) for _ in texts]
+
+    monkeypatch.setattr(sharding, "analyze_sharded", fail_sharded)
+    monkeypatch.setattr(engine, "analyze_texts", fake_analyze_texts)
+    assert len(await engine.analyze(["x"], shards=2)) == 1
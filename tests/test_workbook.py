@@ -0,0 +1,95 @@
+import pathlib
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from kougeki import workbook
+from kougeki.models import AggressivenessResult
+
+from conftest import make_moderation
+
+
+@pytest.fixture
+def scored(monkeypatch):
+    calls: list[str] = []
+
+    async def mock_moderate(text):
+        return make_moderation()
+
+    async def mock_ag_score(text):
+        calls.append(text)
+        return AggressivenessResult(score=len(text), reason=text)
+
+    monkeypatch.setattr("kougeki.services.moderate_text", mock_moderate)
+    monkeypatch.setattr("kougeki.services.get_aggressiveness_score", mock_ag_score)
+    monkeypatch.setattr(
+        "kougeki.services.aggregate_aggressiveness", lambda scores, llm: llm
+    )
+    return calls
+
+
+def test_select_sheets():
+    available = ["4月", "5月", "メモ"]
+
+    assert workbook.select_sheets(available, "") == ["4月"]
+    assert workbook.select_sheets(available, "*") == available
+    assert workbook.select_sheets(available, "メモ, 4月") == ["4月", "メモ"]
+    with pytest.raises(ValueError):
+        workbook.select_sheets(available, "6月")
+
+
+@pytest.mark.asyncio
+async def test_analyze_workbook_writes_results_per_sheet(scored):
+    frames = {
+        "4月": pd.DataFrame({"投稿内容": ["a", "bb"]}),
+        "メモ": pd.DataFrame({"備考": ["x"]}),
+        "5月": pd.DataFrame({"投稿内容": ["ccc"]}),
+    }
+
+    results = await workbook.analyze_workbook(frames, ["4月", "メモ", "5月"], shards=1)
+
+    assert len(results) == 3
+    assert sorted(scored) == ["a", "bb", "ccc"]
+    assert frames["4月"]["aggressiveness_reason"].tolist() == ["a", "bb"]
+    assert frames["5月"]["aggressiveness_score"].tolist() == [3]
+    assert list(frames["メモ"].columns) == ["備考"]
+
+
+@pytest.mark.asyncio
+async def test_analyze_workbook_requires_text_column():
+    with pytest.raises(ValueError):
+        await workbook.analyze_workbook({"メモ": pd.DataFrame({"備考": ["x"]})})
+
+
+@pytest.mark.asyncio
+async def test_unselected_sheets_are_left_untouched(scored):
+    frames = {
+        "4月": pd.DataFrame({"投稿内容": ["a"]}),
+        "5月": pd.DataFrame({"投稿内容": ["bb"]}),
+    }
+
+    await workbook.analyze_workbook(frames, ["5月"], shards=1)
+
+    assert scored == ["bb"]
+    assert list(frames["4月"].columns) == ["投稿内容"]
+    assert frames["5月"]["aggressiveness_score"].tolist() == [2]
+
+
+@pytest.mark.asyncio
+async def test_backfill_workbook_covers_every_sheet(scored):
+    frames = {
+        "4月": pd.DataFrame({"投稿内容": ["a", "bb"], "llm_pending": [False, True]}),
+        "メモ": pd.DataFrame({"備考": ["x"]}),
+        "5月": pd.DataFrame({"投稿内容": ["ccc"], "llm_pending": [True]}),
+    }
+
+    count = await workbook.backfill_workbook(frames, shards=1)
+
+    assert count == 2
+    assert sorted(scored) == ["bb", "ccc"]
+    assert frames["4月"]["llm_pending"].tolist() == [False, False]
+    assert frames["4月"]["aggressiveness_score"].tolist()[1] == 2
+    assert frames["5月"]["aggressiveness_score"].tolist() == [3]